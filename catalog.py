@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Scene catalog with precomputed metadata.
+
+Listing scenes or planning runs should not require loading trajectory
+arrays. The catalog keeps one index file per data root (``.catalog.json``)
+holding, for every scene directory, the data file ``data.data_mix`` would
+load plus its frame/car counts, dtype, xy bounds, replay duration and a
+fingerprint. ``frames``/``duration_s`` describe what a replay plays (after
+data_mix's default truncation); ``source_frames``/``source_duration_s`` and
+``bounds`` describe the whole file. ``refresh()`` only re-reads files whose
+size or mtime changed.
+
+Examples:
+  python3 catalog.py list
+  python3 catalog.py show roundabout
+  python3 catalog.py --data-root data refresh --force
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import data
+
+CATALOG_VERSION = 2
+INDEX_FILE = ".catalog.json"
+
+
+def _fingerprint(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def describe(scene_dir: str, path: str, data_root: str) -> Dict:
+    """Build a catalog entry by reading ``path`` once."""
+    arr = np.load(path, mmap_mode="r", allow_pickle=False)
+    if arr.ndim != 3 or arr.shape[-1] != 4:
+        raise ValueError(f"Unexpected data format for scene '{scene_dir}': shape={arr.shape}")
+    T, N = int(arr.shape[0]), int(arr.shape[1])
+    max_frames = data.default_max_frames(scene_dir)
+    played = T if max_frames is None else min(T, max_frames)
+    xy = np.asarray(arr[..., 1:3], dtype=np.float64)
+    st = os.stat(path)
+    return {
+        "scene": scene_dir,
+        "file": os.path.relpath(path, data_root),
+        "frames": played,
+        "source_frames": T,
+        "cars": N,
+        "dtype": str(arr.dtype),
+        "bounds": {
+            "x": [float(np.nanmin(xy[..., 0])), float(np.nanmax(xy[..., 0]))],
+            "y": [float(np.nanmin(xy[..., 1])), float(np.nanmax(xy[..., 1]))],
+        } if T and N else None,
+        "duration_s": max(played - 1, 0) * data.FRAME_SECONDS,
+        "source_duration_s": max(T - 1, 0) * data.FRAME_SECONDS,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "sha1": _fingerprint(path),
+    }
+
+
+class SceneCatalog():
+    """Index of the scenes under ``data_root``, stored in ``data_root/.catalog.json``."""
+
+    def __init__(self, data_root: str = "data"):
+        self.data_root = data_root
+        self.index_path = os.path.join(data_root, INDEX_FILE)
+        self.entries: Dict[str, Dict] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path) as f:
+                index = json.load(f)
+        except ValueError:
+            print(f"Ignoring unreadable catalog {self.index_path}")
+            return
+        if index.get("version") == CATALOG_VERSION:
+            self.entries = index.get("scenes", {})
+
+    def save(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"version": CATALOG_VERSION, "scenes": self.entries}, f, indent=1, sort_keys=True)
+        os.replace(tmp, self.index_path)
+
+    def refresh(self, force: bool = False) -> Tuple[List[str], List[str]]:
+        """Re-index new or modified scenes and drop removed ones.
+
+        Returns (updated, removed) scene names. The index is only rewritten
+        when something changed.
+        """
+        updated, removed = [], []
+        seen = set()
+        for entry in sorted(os.listdir(self.data_root)) if os.path.isdir(self.data_root) else []:
+            if not os.path.isdir(os.path.join(self.data_root, entry)):
+                continue
+            try:
+                scene_dir, path = data.scene_data_path(entry, data_root=self.data_root)
+            except FileNotFoundError:
+                continue
+            seen.add(scene_dir)
+            st = os.stat(path)
+            old = self.entries.get(scene_dir)
+            if (not force and old is not None
+                    and old["file"] == os.path.relpath(path, self.data_root)
+                    and old["size"] == st.st_size and old["mtime_ns"] == st.st_mtime_ns):
+                continue
+            self.entries[scene_dir] = describe(scene_dir, path, self.data_root)
+            updated.append(scene_dir)
+        for scene_dir in sorted(set(self.entries) - seen):
+            del self.entries[scene_dir]
+            removed.append(scene_dir)
+        if updated or removed or not os.path.exists(self.index_path):
+            self.save()
+        return updated, removed
+
+    def scenes(self) -> List[Dict]:
+        return [self.entries[k] for k in sorted(self.entries)]
+
+    def get(self, scene: str) -> Optional[Dict]:
+        """Entry for ``scene`` (case-insensitive), or None."""
+        if scene in self.entries:
+            return self.entries[scene]
+        for name, entry in self.entries.items():
+            if name.lower() == scene.lower():
+                return entry
+        return None
+
+
+def load_catalog(data_root: str = "data", refresh: bool = True) -> SceneCatalog:
+    cat = SceneCatalog(data_root)
+    if refresh:
+        cat.refresh()
+    return cat
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="List scenes and their metadata without loading trajectories")
+    p.add_argument("--data-root", default="data")
+    p.add_argument("--no-refresh", dest="refresh", action="store_false", help="Use the index as-is")
+    sub = p.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("list", help="One line per scene")
+    p_show = sub.add_parser("show", help="Full entry for one scene as JSON")
+    p_show.add_argument("scene")
+    p_refresh = sub.add_parser("refresh", help="Update the index")
+    p_refresh.add_argument("--force", action="store_true", help="Re-read every scene")
+    return p
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    cat = SceneCatalog(args.data_root)
+
+    if args.cmd == "refresh":
+        updated, removed = cat.refresh(force=args.force)
+        print(f"Updated: {updated or '-'}  Removed: {removed or '-'}  ({cat.index_path})")
+        return 0
+
+    if args.refresh:
+        cat.refresh()
+
+    if args.cmd == "show":
+        entry = cat.get(args.scene)
+        if entry is None:
+            print(f"Scene '{args.scene}' not in catalog {cat.index_path}")
+            return 2
+        print(json.dumps(entry, indent=2))
+        return 0
+
+    for e in cat.scenes():
+        b = e["bounds"]
+        bounds = f"x[{b['x'][0]:.1f}, {b['x'][1]:.1f}] y[{b['y'][0]:.1f}, {b['y'][1]:.1f}]" if b else "-"
+        frames = f"{e['frames']}/{e['source_frames']}" if e['frames'] != e['source_frames'] else f"{e['frames']}"
+        print(f"{e['scene']:<20} T={frames:<8} N={e['cars']:<4} {e['dtype']:<8} {e['duration_s']:7.1f}s  {bounds}  {e['file']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
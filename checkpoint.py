@@ -0,0 +1,96 @@
+"""Replay checkpoints so a long capture can resume after a crash.
+
+A checkpoint records the last fully simulated tick together with the frames
+that were already written to disk. Frame files are named by their position in
+the output stream, so resuming only needs the next stream offset to keep the
+final video in order.
+"""
+
+import glob
+import json
+import os
+from typing import Dict, List, Optional
+
+CHECKPOINT_VERSION = 5
+DEFAULT_CHECKPOINT = os.path.join('test', 'checkpoint.json')
+
+
+def save_checkpoint(path: str, *, scene: str, view: str, town: str, tick: int,
+                    frames: List[List[int]], complete: bool = False, window: Optional[List] = None,
+                    profile: Optional[str] = None, resolution: Optional[List[int]] = None,
+                    capture_every: Optional[int] = None, output: Optional[str] = None) -> None:
+    """Atomically write a checkpoint.
+
+    frames: [[stream_index, carla_frame_id, tick], ...] of images already on disk.
+    window: [start_frame, end_frame] of the replayed source frames; ticks are
+    relative to start_frame.
+    profile, resolution ([width, height]) and capture_every: render settings
+    the frames were captured with; resuming must use the same ones.
+    output: frame store backend ('jpeg' or 'shards').
+    """
+    state = {
+        "version": CHECKPOINT_VERSION,
+        "scene": scene,
+        "view": view,
+        "town": town,
+        "window": list(window) if window is not None else None,
+        "profile": profile,
+        "resolution": [int(v) for v in resolution] if resolution is not None else None,
+        "capture_every": int(capture_every) if capture_every is not None else None,
+        "output": output,
+        "tick": int(tick),
+        "frames": [[int(v) for v in f] for f in frames],
+        "next_offset": (max(f[0] for f in frames) + 1) if frames else 0,
+        "complete": bool(complete),
+    }
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp, path)
+
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    """Return the checkpoint stored at ``path``, or None if there is none."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        state = json.load(f)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}: {state.get('version')}")
+    return state
+
+
+def check_compatible(state: Dict, *, scene: str, view: str, town: str, window: Optional[List] = None,
+                     profile: Optional[str] = None, resolution: Optional[List[int]] = None,
+                     capture_every: Optional[int] = None, output: Optional[str] = None) -> None:
+    """Raise ValueError if resuming ``state`` with these settings would mix incompatible frames."""
+    window = list(window) if window is not None else None
+    resolution = [int(v) for v in resolution] if resolution is not None else None
+    for key, value in (("scene", scene), ("view", view), ("town", town), ("window", window),
+                       ("profile", profile), ("resolution", resolution), ("capture_every", capture_every),
+                       ("output", output)):
+        if state.get(key) != value:
+            raise ValueError(
+                f"Checkpoint {key}={state.get(key)!r} does not match requested {key}={value!r}"
+            )
+
+
+def prune_frames(out_dir: str, frames: List[List[int]], pattern: str = 'test*.jpg') -> int:
+    """Delete images in ``out_dir`` that the checkpoint does not account for.
+
+    Those were written after the last checkpoint and will be captured again.
+    Returns the number of removed files.
+    """
+    keep = {int(f[0]) for f in frames}
+    removed = 0
+    for f in glob.glob(os.path.join(out_dir, pattern)):
+        stem = os.path.splitext(os.path.basename(f))[0]
+        try:
+            seq = int(stem[len('test'):])
+        except ValueError:
+            continue
+        if seq not in keep:
+            os.remove(f)
+            removed += 1
+    return removed
@@ -0,0 +1,115 @@
+"""In-process consumers for captured camera frames.
+
+``CarlaControl.subscribe()`` returns a :class:`FrameSubscription`. While
+``play_video`` runs (usually in another thread), every captured image is
+pushed to each subscription as a :class:`CapturedFrame`. The optional ROI crop
+and resize happen once, at capture time. Frames are uint8 BGR arrays (the
+channel order cv2 uses), so they can go straight into training or evaluation
+code without a JPEG round trip through disk.
+
+    sub = carla_control.subscribe(maxsize=8, size=(640, 360))
+    threading.Thread(target=carla_control.play_video, args=(hero, npcs),
+                     kwargs={"save_images": False, "wait_for_enter": False}).start()
+    for frame in sub:
+        model.step(frame.image, frame.poses)
+"""
+
+import asyncio
+import threading
+from collections import deque, namedtuple
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+CapturedFrame = namedtuple("CapturedFrame", ["tick", "camera", "image", "poses"])
+CapturedFrame.__doc__ = """One captured image.
+
+tick: trajectory tick that produced the image
+camera: sensor name (the view, e.g. 'Top')
+image: (H, W, 3) uint8 BGR array
+poses: {actor name: (x, y, z, pitch, yaw, roll)}; the hero is -1
+"""
+
+
+class FrameSubscription():
+    """Bounded buffer of :class:`CapturedFrame` fed by the replay loop.
+
+    roi: (x, y, width, height) crop applied before resizing.
+    size: (width, height) to resize to.
+    drop_oldest: when the queue is full, discard the oldest frame instead of
+    blocking the replay until the consumer catches up.
+    """
+
+    def __init__(self, maxsize: int = 16, size: Optional[Tuple[int, int]] = None,
+                 roi: Optional[Tuple[int, int, int, int]] = None, drop_oldest: bool = False):
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}")
+        self.maxsize = maxsize
+        self.size = size
+        self.roi = roi
+        self.drop_oldest = drop_oldest
+        self.dropped = 0
+        self.closed = False
+        self._frames = deque()
+        self._cond = threading.Condition()
+
+    def transform(self, image: np.ndarray) -> np.ndarray:
+        if self.roi is not None:
+            x, y, w, h = self.roi
+            image = image[y:y + h, x:x + w]
+        if self.size is not None and (image.shape[1], image.shape[0]) != tuple(self.size):
+            import cv2
+
+            image = cv2.resize(image, tuple(self.size), interpolation=cv2.INTER_AREA)
+        # Consumers own their frame; never hand out a view of the sensor buffer.
+        return np.array(image, dtype=np.uint8, copy=True)
+
+    def publish(self, tick: int, camera: str, image: np.ndarray, poses) -> None:
+        if self.closed:
+            return
+        item = CapturedFrame(tick, camera, self.transform(image), poses)
+        with self._cond:
+            if self.drop_oldest:
+                while len(self._frames) >= self.maxsize:
+                    self._frames.popleft()
+                    self.dropped += 1
+            else:
+                self._cond.wait_for(lambda: len(self._frames) < self.maxsize or self.closed)
+                if self.closed:
+                    return
+            self._frames.append(item)
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Signal the end of the stream; consumers stop after the queued frames."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def get(self, timeout: Optional[float] = None) -> Optional[CapturedFrame]:
+        """Next frame, or None once the stream is closed and drained.
+
+        Raises TimeoutError if nothing arrives within ``timeout`` seconds.
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frames or self.closed, timeout=timeout):
+                raise TimeoutError(f"No frame within {timeout}s")
+            if not self._frames:
+                return None
+            item = self._frames.popleft()
+            self._cond.notify_all()
+            return item
+
+    def __iter__(self) -> Iterator[CapturedFrame]:
+        while True:
+            item = self.get()
+            if item is None:
+                return
+            yield item
+
+    async def __aiter__(self):
+        while True:
+            item = await asyncio.to_thread(self.get)
+            if item is None:
+                return
+            yield item
@@ -1,10 +1,19 @@
+import argparse
 import copy
 import glob
-import math
+import json
 import os
 import sys
 
+import checkpoint
 import data
+import frame_stream
+import render_profiles
+import sensor_sync
+import shards
+import streaming
+import trajectory
+import validation
 
 import threading
 import time
@@ -15,59 +24,169 @@ import numpy as np
 import cv2
 import carla
 
-IM_WIDTH = 1280
-IM_HEIIGHT = 720
-RECORDING = False
+TOP_VIEW_HEIGHT = 25
+FIXED_DELTA_SECONDS = 0.01
+RENDER_STATS_FILE = 'render_stats.jsonl'
+
+# Output stream state: images are numbered by stream index so that a resumed
+# replay (whose CARLA frame ids may restart) still sorts after earlier frames.
+CAPTURED_FRAMES = []  # [[stream_index, carla_frame_id, tick], ...] already on disk
+_capture_lock = threading.Lock()
+_next_stream_index = 0
+_pending_writes = []
+# Output backend: None writes one JPEG per frame, otherwise a shards.ShardWriter.
+_shard_writer = None
+
+def _join_writes():
+    with _capture_lock:
+        pending = list(_pending_writes)
+        _pending_writes.clear()
+    for t in pending:
+        t.join()
+
+def close_output():
+    '''Wait for in-flight writes and close the shard writer; frames go to JPEGs until set_output is called again.'''
+    global _shard_writer
+    _join_writes()
+    if _shard_writer is not None:
+        _shard_writer.close()
+        _shard_writer = None
+
+def set_output(backend='jpeg', shard_size_mb=256):
+    '''Choose where process_img stores frames: 'jpeg' files or tar 'shards' in test/.'''
+    global _shard_writer
+    if backend not in ('jpeg', 'shards'):
+        raise ValueError(f"Unsupported output backend: {backend}")
+    close_output()
+    if backend == 'shards':
+        _shard_writer = shards.ShardWriter('test', max_bytes=int(shard_size_mb * (1 << 20)))
 
 def clean_up():
     file_list = glob.glob('test/*.jpg')
     for f in file_list:
         os.remove(f)
+    shards.clear('test')
     os.makedirs('test', exist_ok=True)
 
-def process_img(data):
-    if not RECORDING:
-        return
+def image_to_array(data):
+    '''(H, W, 3) uint8 BGR view of a CARLA camera image (no copy).'''
+    i = np.frombuffer(data.raw_data, dtype=np.uint8)
+    i2 = i.reshape((data.height, data.width, 4))
+    return i2[:, :, :3]
+
+def process_img(data, tick, camera=None, poses=None):
+    '''
+    Save a camera image captured for trajectory tick `tick` and return it as uint8 BGR.
+    With the shard backend, camera and poses are stored next to the image.
+    '''
+    global _next_stream_index
     frame = data.frame
-    i = np.array(data.raw_data)
-    i2 = i.reshape((IM_HEIIGHT, IM_WIDTH, 4))
-    i3 = i2[:, :, :3]
-    filePath = os.path.join('test', 'test' + f'{frame:09d}' + '.jpg')
+    i3 = image_to_array(data)
+    with _capture_lock:
+        seq = _next_stream_index
+        _next_stream_index += 1
     # Save image in a separate thread
-    threading.Thread(target=cv2.imwrite, args=(filePath, i3)).start()
-    return i3 / 255.0
-
-def img2video(scene='ChangeLane', view='Top'):
-    img_array = []
-    file_list = sorted(glob.glob('test/*.jpg'), key=lambda x: int(x.split('/')[-1].split('.')[0].split('t')[-1]))
-    
-    if not file_list:
-        print("No images found to create video")
+    if _shard_writer is not None:
+        meta = {'seq': seq, 'frame': frame, 'tick': tick, 'camera': camera, 'poses': poses}
+        t = threading.Thread(target=_write_shard_sample, args=(i3, meta))
+    else:
+        filePath = os.path.join('test', 'test' + f'{seq:09d}' + '.jpg')
+        t = threading.Thread(target=_write_frame, args=(filePath, i3, seq, frame, tick))
+    t.start()
+    with _capture_lock:
+        _pending_writes.append(t)
+    return i3
+
+def _write_frame(file_path, img, seq, frame, tick):
+    cv2.imwrite(file_path, img)
+    with _capture_lock:
+        CAPTURED_FRAMES.append([seq, frame, tick])
+
+def _write_shard_sample(img, meta):
+    ok, buf = cv2.imencode('.jpg', img)
+    if not ok:
+        print(f"Failed to encode frame {meta['seq']}")
         return
+    _shard_writer.add(f"{meta['seq']:09d}", {'jpg': buf.tobytes(), 'json': json.dumps(meta).encode()})
+    with _capture_lock:
+        CAPTURED_FRAMES.append([meta['seq'], meta['frame'], meta['tick']])
+
+def flush_writes():
+    '''Wait for in-flight image writes and return a snapshot of CAPTURED_FRAMES.'''
+    _join_writes()
+    if _shard_writer is not None:
+        # Close the open shard so every frame reported here is readable after a crash.
+        _shard_writer.flush()
+    with _capture_lock:
+        return sorted(CAPTURED_FRAMES)
+
+def restore_capture_state(frames):
+    '''Continue the output stream after the frames recorded in a checkpoint.'''
+    global _next_stream_index
+    # A write still running would append to the state being replaced.
+    _join_writes()
+    with _capture_lock:
+        CAPTURED_FRAMES[:] = [list(f) for f in frames]
+        _next_stream_index = (max(f[0] for f in frames) + 1) if frames else 0
+
+def video_path(scene='ChangeLane', view='Top'):
+    return f'highway2carla_{scene}_{view}.mp4'
+
+def img2video(scene='ChangeLane', view='Top', output=None):
+    '''Encode the captured frames; `output` picks the store ('jpeg' or 'shards'), default: shards if any exist.'''
+    if output is None:
+        output = 'shards' if shards.has_shards('test') else 'jpeg'
+    reader = None
+    if output == 'shards':
+        reader = shards.ShardReader('test')
+        keys = reader.keys()
+        frames = (cv2.imdecode(np.frombuffer(reader.read(k, 'jpg'), dtype=np.uint8), cv2.IMREAD_COLOR) for k in keys)
+    else:
+        keys = sorted(glob.glob('test/*.jpg'), key=lambda x: int(x.split('/')[-1].split('.')[0].split('t')[-1]))
+        frames = (cv2.imread(f) for f in keys)
     
-    for filename in file_list:
-        img = cv2.imread(filename)
-        height, width, _ = img.shape
-        size = (width, height)
-        img_array.append(img)
-    videoName = f'highway2carla_{scene}_{view}.mp4'
-    out = cv2.VideoWriter(videoName, cv2.VideoWriter_fourcc(*'mp4v'), 15, size)
-    for i in range(len(img_array)):
-        out.write(img_array[i])
-    out.release()
+    try:
+        if not keys:
+            print("No images found to create video")
+            return
+        
+        # Stream frames into the writer instead of holding the whole video in memory
+        out = None
+        videoName = video_path(scene, view)
+        for img in frames:
+            if out is None:
+                height, width, _ = img.shape
+                out = cv2.VideoWriter(videoName, cv2.VideoWriter_fourcc(*'mp4v'), 15, (width, height))
+            out.write(img)
+        out.release()
+    finally:
+        if reader is not None:
+            reader.close()
 
 class CarlaControl():
-    def __init__(self, ip='localhost', port=2000, view='Top'):
-        self.client = carla.Client(ip, port)
-        self.client.set_timeout(10.0)
+    def __init__(self, ip='localhost', port=2000, view='Top', client=None, capture_every=None,
+                 profile=render_profiles.DEFAULT_PROFILE, blueprint_library=None):
+        # An existing client (e.g. the daemon's warm session) skips reconnecting,
+        # and a blueprint library cached alongside it skips the lookup.
+        self.warm = client is not None
+        if client is None:
+            client = carla.Client(ip, port)
+            client.set_timeout(10.0)
+        self.client = client
         self.world = self.client.get_world()
+        self._blueprint_library = blueprint_library
 
         self.settings = self.world.get_settings()
         self.settings.synchronous_mode = True # Enables synchronous mode
-        self.settings.fixed_delta_seconds = 0.01
+        self.settings.fixed_delta_seconds = FIXED_DELTA_SECONDS
         self.world.apply_settings(self.settings)
 
         self.view = view
+        # Resolution, FOV, post-processing, unloaded layers and capture rate; see render_profiles.
+        self.profile = render_profiles.get_profile(profile) if isinstance(profile, str) else profile
+        self.sync = sensor_sync.SensorSync(FIXED_DELTA_SECONDS, capture_every=capture_every or self.profile.capture_every)
+        self.last_stats = None
+        self.subscriptions = []
 
         self.actor_list =  []
 
@@ -108,13 +227,23 @@ class CarlaControl():
 
     def change_map(self, TOWN='Town05'):
         self.world = self.client.load_world(TOWN)
+        self._blueprint_library = None
+
+    def blueprint_library(self):
+        if self._blueprint_library is None:
+            self._blueprint_library = self.world.get_blueprint_library()
+        return self._blueprint_library
     
     def untoggle_layer(self, layer=carla.MapLayer.Buildings):
         self.world.unload_map_layer(layer)
 
+    def apply_render_profile(self):
+        '''Load/unload map layers to match the current render profile.'''
+        render_profiles.apply_map_layers(self.world, self.profile)
+
     def create_car(self, car_name, position_x, position_y, position_z, position_p, position_yaw, position_r, car_model="audi"):
         spawn_point = Transform(Location(x=position_x, y=position_y, z=position_z), Rotation(pitch=position_p, yaw=position_yaw, roll=position_r))
-        blueprint_library = self.world.get_blueprint_library()
+        blueprint_library = self.blueprint_library()
         # CARLA blueprint filter matches patterns like 'vehicle.*' or '*model3*'.
         # If user passes a short token like 'audi'/'model3', treat it as a substring match.
         pattern = car_model if ('*' in car_model or '?' in car_model) else f"*{car_model}*"
@@ -145,9 +274,36 @@ class CarlaControl():
         print(f'Car {car_name} created! Type: {vehicle} (blueprint={bp.id})')
         return vehicle
 
+    def subscribe(self, maxsize=16, size=None, roi=None, drop_oldest=False):
+        '''
+        Receive captured frames in-process as frame_stream.CapturedFrame tuples.
+        See frame_stream.FrameSubscription for the options; the subscription is
+        closed when play_video returns.
+        '''
+        sub = frame_stream.FrameSubscription(maxsize=maxsize, size=size, roi=roi, drop_oldest=drop_oldest)
+        self.subscriptions.append(sub)
+        return sub
+
+    @staticmethod
+    def _poses(tick, my_car, npc_cars, car_names):
+        '''{actor name: (x, y, z, pitch, yaw, roll)} of the hero (-1) and live NPCs at `tick`.'''
+        poses = {-1: my_car.pose(tick)}
+        for i in car_names:
+            if i >= 0:
+                poses[i] = npc_cars[i].pose(tick)
+        return poses
+
+    def _publish(self, tick, camera, image, poses):
+        for sub in self.subscriptions:
+            sub.publish(tick, camera, image, poses)
+
     def close(self):
+        for sub in self.subscriptions:
+            sub.close()
+        self.subscriptions = []
         for _, actor in self.actor_list:
             actor.destroy()
+        self.actor_list = []
         print("All cleaned up!")
 
     def move_car(self, car_name, position_x, position_y, position_z, position_p, position_yaw, position_r):
@@ -157,13 +313,16 @@ class CarlaControl():
                 self.actor_list[i][1].set_transform(spawn_point)
                 return
 
+    def destroy_car(self, car_name):
+        for i in range(len(self.actor_list)):
+            if self.actor_list[i][0] == car_name:
+                self.actor_list.pop(i)[1].destroy()
+                return
+
     def setup_sensors(self, player_car):
-        blueprint_library = self.world.get_blueprint_library()
+        blueprint_library = self.blueprint_library()
         cam_bp = blueprint_library.find("sensor.camera.rgb")
-        cam_bp.set_attribute("image_size_x", f"{IM_WIDTH}")
-        cam_bp.set_attribute("image_size_y", f"{IM_HEIIGHT}")
-        cam_bp.set_attribute("fov", "110")
-        cam_bp.set_attribute("sensor_tick", "0.05")
+        render_profiles.apply_camera(cam_bp, self.profile, self.sync.sensor_tick)
 
         if self.view == 'Front':
             # Place the camera slightly above and behind the vehicle and tilt it down
@@ -174,61 +333,148 @@ class CarlaControl():
             )
             sensor = self.world.try_spawn_actor(cam_bp, spawn_point, attach_to=player_car)
             if sensor is not None:
-                sensor.listen(lambda data: process_img(data))
+                self.sync.add_sensor(self.view, sensor)
                 self.actor_list.append([-100, sensor])
             else:
                 raise ValueError('Failed to create front view camera sensor')
 
         elif self.view == 'Top':
-            spawn_point = carla.Transform(carla.Location(x=0, z=25), Rotation(yaw=90, pitch=-90))
+            spawn_point = carla.Transform(carla.Location(x=0, z=TOP_VIEW_HEIGHT), Rotation(yaw=90, pitch=-90))
             sensor = self.world.try_spawn_actor(cam_bp, spawn_point, attach_to=player_car)
             if sensor is not None:
-                sensor.listen(lambda data: process_img(data))
+                self.sync.add_sensor(self.view, sensor)
                 self.actor_list.append([-110, sensor])
             else:
                 raise ValueError('Failed to create top view camera sensor')
         else:
             raise ValueError(f"Unsupported view: {self.view}")
 
-    def play_video(self, my_car, npc_cars, player_car_model='audi'):
+    def _spawn_npc(self, i, path, t):
+        return self.create_car(i, *path.pose(t), car_model="model3")
+
+    def play_video(self, my_car, npc_cars, player_car_model='audi', stream_radius=None, stream_hysteresis=10.0,
+                   start_tick=1, on_checkpoint=None, checkpoint_every=1000, wait_for_enter=True, save_images=True):
+        '''
+        my_car: hero Trajectory in TOWN_FIELDS layout.
+        npc_cars: TrajectorySet of NPC paths in TOWN_FIELDS layout.
+        stream_radius: if set, only NPCs within this distance (m) of the hero are
+        kept alive; they spawn/despawn with `stream_hysteresis` metres of slack.
+        The Top view widens the radius to its camera footprint. The Front view
+        sees up to the horizon, so distant cars in frame are dropped (see
+        streaming.make_streamer).
+        start_tick: first tick to simulate; actors are spawned at the poses of
+        `start_tick - 1` (used when resuming from a checkpoint).
+        on_checkpoint: called as on_checkpoint(tick, complete) every
+        `checkpoint_every` ticks and once after the last tick.
+        wait_for_enter: prompt before moving cars (disabled for daemon jobs).
+        save_images: write JPEGs to test/; turn off when only subscribers
+        (see subscribe()) consume the frames.
+
+        Returns True if the whole trajectory was replayed.
+        '''
+        try:
+            return self._play_video(
+                my_car, npc_cars, player_car_model=player_car_model,
+                stream_radius=stream_radius, stream_hysteresis=stream_hysteresis,
+                start_tick=start_tick, on_checkpoint=on_checkpoint, checkpoint_every=checkpoint_every,
+                wait_for_enter=wait_for_enter, save_images=save_images,
+            )
+        finally:
+            # Let subscribers know the stream has ended.
+            for sub in self.subscriptions:
+                sub.close()
+
+    def _play_video(self, my_car, npc_cars, player_car_model='audi', stream_radius=None, stream_hysteresis=10.0,
+                    start_tick=1, on_checkpoint=None, checkpoint_every=1000, wait_for_enter=True, save_images=True):
+        spawn_tick = max(0, start_tick - 1)
+        streamer = streaming.make_streamer(
+            my_car, npc_cars, stream_radius, stream_hysteresis,
+            camera_height=TOP_VIEW_HEIGHT if self.view == 'Top' else None,
+            fov_deg=self.profile.fov, aspect=self.profile.aspect,
+        )
 
         print('create npc cars')
-        for i in range(len(npc_cars)):
-            self.create_car(i, npc_cars[i][0][1], npc_cars[i][0][2], npc_cars[i][0][3], npc_cars[i][0][4], npc_cars[i][0][5], npc_cars[i][0][6], car_model="model3")
-        
+        if streamer is None:
+            for i in range(len(npc_cars)):
+                # Empty paths have no pose; streaming treats them as infinitely far away.
+                if len(npc_cars[i]) > 0:
+                    self._spawn_npc(i, npc_cars[i], spawn_tick)
+        else:
+            to_spawn, _ = streamer.step(spawn_tick)
+            for i in to_spawn:
+                if self._spawn_npc(i, npc_cars[i], spawn_tick) is None:
+                    streamer.drop(i, spawn_tick)
+            print(f'streaming {len(to_spawn)}/{len(npc_cars)} npc cars within {streamer.radius:.1f}m')
+
         print('create player car')
         print(f"my_car length: {len(my_car)}")
-        print(f"my_car[0]: {my_car[0]}")
-        print(f"Accessing indices - [1]:{my_car[0][1]}, [2]:{my_car[0][2]}, [3]:{my_car[0][3]}, [4]:{my_car[0][4]}, [5]:{my_car[0][5]}, [6]:{my_car[0][6]}")
-        player_car = self.create_car(-1, my_car[0][1], my_car[0][2], my_car[0][3], my_car[0][4], my_car[0][5], my_car[0][6], car_model=player_car_model)
+        hero_start = my_car.pose(spawn_tick)
+        print(f"my_car[{spawn_tick}] (x, y, z, pitch, yaw, roll): {hero_start}")
+        player_car = self.create_car(-1, *hero_start, car_model=player_car_model)
 
         if player_car is None:
             print('Failed to create player car')
-            return
+            return False
         
 
-        # Wait for car to be created
-        time.sleep(1)
+        # Wait for car to be created; a warm or unattended run goes straight on.
+        if wait_for_enter and not self.warm:
+            time.sleep(1)
 
         print('create camera')
         self.setup_sensors(player_car)
 
-        input("Press Enter to start moving cars...")
-        global RECORDING
-        RECORDING = True
+        if wait_for_enter:
+            input("Press Enter to start moving cars...")
+        # Lock onto each camera's capture schedule before recording starts.
+        self.sync.prime(self.world)
+        stats = self.last_stats = render_profiles.RenderStats(self.profile)
+        stats.start()
         print('moving car')
         car_names = set([actor[0] for actor in self.actor_list])
-        for time_count in range(1, len(my_car)):
+        for time_count in range(start_tick, len(my_car)):
             
-            self.move_car(-1, my_car[time_count][1], my_car[time_count][2], my_car[time_count][3], my_car[time_count][4], my_car[time_count][5], my_car[time_count][6])
+            self.move_car(-1, *my_car.pose(time_count))
+            if streamer is not None:
+                to_spawn, to_despawn = streamer.step(time_count)
+                for i in to_despawn:
+                    self.destroy_car(i)
+                    car_names.discard(i)
+                for i in to_spawn:
+                    if self._spawn_npc(i, npc_cars[i], time_count) is None:
+                        streamer.drop(i, time_count)
+                    else:
+                        car_names.add(i)
             for i in range(len(npc_cars)):
                 if i not in car_names:
                     continue
-                if time_count < len(npc_cars[i]):
-                    self.move_car(i, npc_cars[i][time_count][1], npc_cars[i][time_count][2], npc_cars[i][time_count][3], npc_cars[i][time_count][4], npc_cars[i][time_count][5], npc_cars[i][time_count][6])
+                path = npc_cars[i]
+                if time_count < len(path):
+                    self.move_car(i, *path.pose(time_count))
                 
-            # Wait for the simulator to tick
-            self.world.tick()
+            # Tick the simulator and save exactly the images rendered for this tick
+            images = self.sync.tick(self.world)
+            stats.tick(len(images))
+            for camera, image in images:
+                # Late images belong to an earlier tick than the one just simulated.
+                image_tick = time_count - (self.sync.frame - image.frame)
+                poses = None
+                if self.subscriptions or (save_images and _shard_writer is not None):
+                    poses = self._poses(image_tick, my_car, npc_cars, car_names)
+                frame = process_img(image, image_tick, camera, poses) if save_images else image_to_array(image)
+                if self.subscriptions:
+                    self._publish(image_tick, camera, frame, poses)
+
+            if on_checkpoint is not None and time_count % checkpoint_every == 0:
+                on_checkpoint(time_count, False)
+
+        stats.stop()
+        print(stats.summary())
+        if on_checkpoint is not None:
+            on_checkpoint(len(my_car) - 1, True)
+        if self.sync.missed or self.sync.late or self.sync.drifted:
+            print(f"Sensor sync: {self.sync.missed} frames missed, {self.sync.late} late, {self.sync.drifted} re-aligned")
+        return True
 
 
 class HighwayPathToCarlaPath():
@@ -241,6 +487,7 @@ class HighwayPathToCarlaPath():
         #         point[1] -= min_x
 
     def exchange_to_town(self, town_id, yaw_offset_deg=0.0, pitch_deg=0.0, roll_deg=0.0):
+        '''Return a TrajectorySet in TOWN_FIELDS layout: [frame, x, y, z, pitch, yaw, roll].'''
         if town_id == 'Town06' or town_id == 'Town06_Opt':
             # init_pose = [x_offset, y_offset, z_height]
             # NOTE: the 3rd value is Z (height), NOT orientation.
@@ -254,29 +501,56 @@ class HighwayPathToCarlaPath():
         else:
             raise ValueError(f"Unsupported town_id: {town_id}")
 
-        town_path = []
-        for point_list in self.path_list:
-            tmp_path = []
-            for point in point_list:
-                # [frame, x, y, z, pitch, yaw, roll]
-                yaw_deg = (point[3] * 180 / math.pi) + yaw_offset_deg
-                tmp_path.append([
-                    point[0],
-                    point[1] + self.init_pose[0] - min_x,
-                    point[2] + self.init_pose[1],
-                    self.init_pose[2],
-                    pitch_deg,
-                    yaw_deg,
-                    roll_deg,
-                ])
-            town_path.append(tmp_path)
-
-        return town_path
+        return trajectory.to_town_layout(
+            self.path_list,
+            self.init_pose,
+            min_x=min_x,
+            yaw_offset_deg=yaw_offset_deg,
+            pitch_deg=pitch_deg,
+            roll_deg=roll_deg,
+        )
 
-if __name__ == '__main__':
-    scene = 'IntersectionMerge'
-    view = 'Top'
-    town_id = 'Town06'
+def build_parser():
+    parser = argparse.ArgumentParser(description="Replay a dataset scene in CARLA and record it")
+    parser.add_argument("--ip", default='10.16.90.246', help="CARLA server host")
+    parser.add_argument("--port", type=int, default=2000, help="CARLA server port")
+    parser.add_argument("--scene", default='IntersectionMerge')
+    parser.add_argument("--view", choices=['Top', 'Front'], default='Top')
+    parser.add_argument("--town", default='Town06')
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint instead of starting over")
+    parser.add_argument("--checkpoint", default=checkpoint.DEFAULT_CHECKPOINT, help="Checkpoint file path")
+    parser.add_argument("--checkpoint-every", type=int, default=1000, help="Ticks between checkpoints")
+    parser.add_argument("--profile", choices=sorted(render_profiles.PROFILES), default=render_profiles.DEFAULT_PROFILE,
+                        help="Render profile: map layers, camera quality and capture rate")
+    parser.add_argument("--capture-every", type=int, default=None, help="Save a camera frame every N ticks (default: from --profile)")
+    parser.add_argument("--output", choices=['jpeg', 'shards'], default='jpeg',
+                        help="Write one JPEG per frame or append frames with metadata to tar shards in test/")
+    parser.add_argument("--shard-size-mb", type=float, default=256, help="Maximum size of one output shard")
+    parser.add_argument("--stream-radius", type=float, default=None,
+                        help="Only keep NPCs within this distance (m) of the hero alive; the Top view never goes "
+                             "below its camera footprint, the Front view drops cars beyond it even if they are in "
+                             "frame (default: spawn every NPC up front)")
+    parser.add_argument("--stream-hysteresis", type=float, default=10.0,
+                        help="Extra metres an NPC may drift past --stream-radius before it is despawned")
+    parser.add_argument("--start-frame", type=int, default=0, help="First source frame to replay")
+    parser.add_argument("--end-frame", type=int, default=None, help="Last source frame to replay (inclusive, default: last)")
+    parser.add_argument("--validate", choices=['off', 'warn', 'strict'], default='warn',
+                        help="Kinematic checks on the scene before rendering; strict aborts on the first failure")
+    parser.add_argument("--daemon", default=None, help="Submit the job to a running replay daemon, e.g. http://127.0.0.1:8765")
+    return parser
+
+
+def run_replay(carla_control, args, load_map=True, wait_for_enter=True):
+    '''
+    Replay args.scene with an existing CarlaControl and build the video.
+
+    load_map: reload args.town first (the daemon skips this when the town is already loaded).
+    Returns True if the whole scene was replayed.
+    '''
+    scene = args.scene
+    view = args.view
+    town_id = args.town
+    carla_control.view = view
 
     # Orientation tuning (degrees).
     # - "global_*" applies to BOTH hero + NPCs (keeps same reference frame)
@@ -290,9 +564,49 @@ if __name__ == '__main__':
     hero_extra_pitch_deg = 0.0
     hero_extra_roll_deg = 0.0
 
-    carla_control = None
+    finished = False
+    start_tick = 1
+    window = [args.start_frame, args.end_frame]
+    # Frames captured with other settings cannot share one video.
+    render_settings = {
+        "profile": carla_control.profile.name,
+        "resolution": [carla_control.profile.width, carla_control.profile.height],
+        "capture_every": carla_control.sync.capture_every,
+        "output": args.output,
+    }
     try:
-        self_list, actor_list = data.player_data_split(data.data_mix(scene=scene))
+        # Writes left running by an earlier job would land after clean_up()/pruning below.
+        close_output()
+        state = checkpoint.load_checkpoint(args.checkpoint) if args.resume else None
+        if args.resume and state is None:
+            print(f"No checkpoint found at {args.checkpoint}; starting from tick 1")
+        if state is not None:
+            checkpoint.check_compatible(state, scene=scene, view=view, town=town_id, window=window, **render_settings)
+            if state["complete"]:
+                print("Checkpoint says the replay already finished; rebuilding video only")
+                finished = True
+                return finished
+            start_tick = state["tick"] + 1
+            if args.output == 'shards':
+                # Never prune under an open writer; it would finalize a shard that was just deleted.
+                close_output()
+                removed = shards.prune('test', {f"{f[0]:09d}" for f in state["frames"]})
+            else:
+                removed = checkpoint.prune_frames('test', state["frames"])
+            restore_capture_state(state["frames"])
+            print(f"Resuming at tick {start_tick} with {len(state['frames'])} frames kept ({removed} stale removed)")
+
+        scene_index = data.SceneIndex(data.data_mix(scene=scene))
+        scene_data = scene_index.frames(args.start_frame, args.end_frame)
+        if args.validate != 'off':
+            # route_extend renumbers frames, so the source frame column does not matter here.
+            report = validation.validate(
+                scene_data, validation.Limits(check_frames=False), fail_fast=args.validate == 'strict',
+            )
+            print(f"Validation: {report.summary()}")
+        self_list, actor_list = data.player_data_split(scene_data)
+        if window != [0, None]:
+            print(f"Replaying source frames {window[0]}..{window[0] + len(scene_data) - 1} of {scene_index.num_frames}")
         
         print(f"Player trajectory points: {len(self_list)}")
         print(f"Number of NPC cars: {len(actor_list)}")
@@ -313,23 +627,65 @@ if __name__ == '__main__':
             pitch_deg=global_pitch_deg + hero_extra_pitch_deg,
             roll_deg=global_roll_deg + hero_extra_roll_deg,
         )[0]
+        # Only the town-space copies are needed from here on.
+        del self_list, actor_list
         
         print(f"Player path length after conversion: {len(player_path)}")
         if len(player_path) > 0:
             print(f"First player path point: {player_path[0]}")
 
-        carla_control = CarlaControl(ip='10.16.90.246', view=view)
-        carla_control.change_map(town_id)
-        carla_control.untoggle_layer()
-        clean_up()
-        time.sleep(2)
-        carla_control.play_video(player_path, carla_path, player_car_model='model3')
+        if load_map:
+            carla_control.change_map(town_id)
+        carla_control.apply_render_profile()
+        if state is None:
+            clean_up()
+            # A warm daemon process keeps the capture state of the previous job.
+            restore_capture_state([])
+            if os.path.exists(args.checkpoint):
+                os.remove(args.checkpoint)
+        set_output(args.output, args.shard_size_mb)
+        if load_map:
+            time.sleep(2)
+
+        def save(tick, complete):
+            checkpoint.save_checkpoint(
+                args.checkpoint, scene=scene, view=view, town=town_id,
+                tick=tick, frames=flush_writes(), complete=complete, window=window, **render_settings,
+            )
+
+        finished = carla_control.play_video(
+            player_path, carla_path, player_car_model='model3',
+            stream_radius=args.stream_radius, stream_hysteresis=args.stream_hysteresis,
+            start_tick=start_tick, on_checkpoint=save, checkpoint_every=args.checkpoint_every,
+            wait_for_enter=wait_for_enter,
+        )
         # carla_control.play_video(player_path, carla_path)
+        if carla_control.last_stats is not None:
+            carla_control.last_stats.append_to(RENDER_STATS_FILE, scene=scene, view=view, finished=finished)
+        return finished
 
+    finally:
+        carla_control.close()
+        # Leave no open shard or writer thread behind for the next job in a warm process.
+        close_output()
+        if finished:
+            img2video(scene=scene, view=view, output=args.output)
+        else:
+            print(f"Replay did not finish; rerun with --resume to continue from {args.checkpoint}")
+
+
+if __name__ == '__main__':
+    args = build_parser().parse_args()
+
+    if args.daemon:
+        import replay_daemon
+        result = replay_daemon.submit(args.daemon, 'replay', sys.argv[1:])
+        print(f"Daemon result: {result}")
+        sys.exit(0 if result.get("finished") else 1)
+
+    try:
+        carla_control = CarlaControl(ip=args.ip, port=args.port, view=args.view,
+                                     capture_every=args.capture_every, profile=args.profile)
+        run_replay(carla_control, args)
     except Exception as e:
         print(f"An error occurred: {e}")
-
-    finally:
-        if carla_control is not None:
-            carla_control.close()
-        img2video(scene=scene, view=view)
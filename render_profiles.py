@@ -0,0 +1,144 @@
+"""Named render-cost profiles for replays.
+
+A profile bundles everything that trades render cost for quality: which map
+layers are unloaded, the camera resolution, FOV and post-processing
+attributes, and how often a frame is captured. ``preview`` is for quick
+iteration, ``review`` matches the historical defaults and ``final`` is for
+deliverables.
+
+Profile application only needs ``world.load_map_layer``,
+``world.unload_map_layer`` and ``blueprint.set_attribute``, so it can be
+exercised with fake objects by passing ``map_layers`` explicitly.
+"""
+
+import json
+import os
+import time
+from typing import Dict, Optional, Sequence
+
+
+class RenderProfile():
+    def __init__(self, name: str, width: int, height: int, fov: float = 110, capture_every: int = 5,
+                 unload_layers: Sequence[str] = ("Buildings",), camera_attributes: Optional[Dict[str, str]] = None):
+        if capture_every < 1:
+            raise ValueError(f"capture_every must be >= 1, got {capture_every}")
+        self.name = name
+        self.width = int(width)
+        self.height = int(height)
+        self.fov = fov
+        self.capture_every = int(capture_every)
+        self.unload_layers = tuple(unload_layers)
+        self.camera_attributes = dict(camera_attributes or {})
+
+    @property
+    def aspect(self) -> float:
+        return self.width / self.height
+
+    def __repr__(self) -> str:
+        return (f"RenderProfile({self.name!r}, {self.width}x{self.height}, fov={self.fov}, "
+                f"capture_every={self.capture_every}, unload={list(self.unload_layers)})")
+
+
+PROFILES = {
+    "preview": RenderProfile(
+        "preview", 640, 360, capture_every=10,
+        unload_layers=("Buildings", "Decals", "Foliage", "ParkedVehicles", "Particles", "Props", "StreetLights", "Walls"),
+        camera_attributes={"enable_postprocess_effects": "False"},
+    ),
+    "review": RenderProfile(
+        "review", 1280, 720, capture_every=5,
+        unload_layers=("Buildings",),
+    ),
+    "final": RenderProfile(
+        "final", 1920, 1080, capture_every=5,
+        unload_layers=("Buildings",),
+        camera_attributes={"enable_postprocess_effects": "True", "motion_blur_intensity": "0.0"},
+    ),
+}
+DEFAULT_PROFILE = "review"
+
+# Toggleable carla.MapLayer members. Every one a profile does not unload is
+# loaded, so a warm world never keeps the layers of a previous profile.
+MAP_LAYERS = ("Buildings", "Decals", "Foliage", "Ground", "ParkedVehicles",
+              "Particles", "Props", "StreetLights", "Walls")
+
+
+def get_profile(name: str) -> RenderProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown render profile {name!r}; choose from {sorted(PROFILES)}") from None
+
+
+def apply_map_layers(world, profile: RenderProfile, map_layers=None) -> None:
+    """Unload the profile's map layers and load all others.
+
+    ``map_layers`` defaults to ``carla.MapLayer``.
+    """
+    if map_layers is None:
+        import carla
+
+        map_layers = carla.MapLayer
+    for layer in MAP_LAYERS:
+        if layer not in profile.unload_layers:
+            world.load_map_layer(getattr(map_layers, layer))
+    for layer in profile.unload_layers:
+        world.unload_map_layer(getattr(map_layers, layer))
+
+
+def apply_camera(blueprint, profile: RenderProfile, sensor_tick: float) -> None:
+    """Set resolution, FOV, capture rate and post-processing on a camera blueprint."""
+    blueprint.set_attribute("image_size_x", f"{profile.width}")
+    blueprint.set_attribute("image_size_y", f"{profile.height}")
+    blueprint.set_attribute("fov", f"{profile.fov}")
+    blueprint.set_attribute("sensor_tick", f"{sensor_tick}")
+    for key, value in profile.camera_attributes.items():
+        if hasattr(blueprint, "has_attribute") and not blueprint.has_attribute(key):
+            print(f"Camera blueprint has no attribute {key!r}; skipped")
+            continue
+        blueprint.set_attribute(key, value)
+
+
+class RenderStats():
+    """Ticks and captured frames per wall-clock second for one replay."""
+
+    def __init__(self, profile: RenderProfile):
+        self.profile = profile
+        self.ticks = 0
+        self.frames = 0
+        self._start = None
+        self.elapsed = 0.0
+
+    def start(self):
+        self._start = time.perf_counter()
+
+    def tick(self, frames: int = 0):
+        self.ticks += 1
+        self.frames += frames
+
+    def stop(self):
+        if self._start is not None:
+            self.elapsed += time.perf_counter() - self._start
+            self._start = None
+
+    def as_dict(self) -> Dict:
+        secs = self.elapsed or float("nan")
+        return {
+            "profile": self.profile.name,
+            "ticks": self.ticks,
+            "frames": self.frames,
+            "seconds": round(self.elapsed, 3),
+            "ticks_per_second": round(self.ticks / secs, 2) if self.elapsed else None,
+            "frames_per_second": round(self.frames / secs, 2) if self.elapsed else None,
+        }
+
+    def summary(self) -> str:
+        d = self.as_dict()
+        return (f"[{d['profile']}] {d['ticks']} ticks, {d['frames']} frames in {d['seconds']}s "
+                f"({d['ticks_per_second']} ticks/s, {d['frames_per_second']} frames/s)")
+
+    def append_to(self, path: str, **extra) -> None:
+        """Append this run as one JSON line so profiles can be compared over time."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a") as f:
+            f.write(json.dumps({**self.as_dict(), **extra}) + "\n")
@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""Long-lived replay daemon holding a warm CARLA session.
+
+Every run of main.py or spawn_vehicles.py otherwise pays for interpreter
+start-up, heavy imports, a new client, ``load_world`` and settings. The daemon
+keeps the client, the loaded town and its blueprint library alive and runs
+jobs submitted over a small local HTTP/JSON API:
+
+  GET  /status          -> {"town": ..., "busy": bool, "jobs": n}
+  POST /jobs/replay     {"argv": [...main.py arguments...], "cwd": "/path"}
+  POST /jobs/spawn      {"argv": [...spawn_vehicles.py arguments...], "cwd": "/path"}
+  POST /shutdown
+
+Jobs run one at a time because they share a single world. A job runs in the
+submitting client's ``cwd``, so relative paths (data/, test/, the checkpoint,
+the video) resolve exactly as they would for the CLI. Replay jobs return the
+absolute paths of what they wrote.
+
+Examples:
+  # Start the daemon next to the CARLA server and preload Town06
+  python3 replay_daemon.py --carla-ip 10.16.90.246 --town Town06
+
+  # Submit jobs from the existing CLIs
+  python3 main.py --daemon http://127.0.0.1:8765 --scene ChangeLane
+  python3 spawn_vehicles.py --daemon http://127.0.0.1:8765 --town Town06 --keep-seconds 5 from-data
+"""
+
+import argparse
+import json
+import os
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib import error as urlerror
+from urllib import request as urlrequest
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class WarmSession():
+    """A CARLA client plus the currently loaded world and its blueprint library.
+
+    ``client`` only needs ``get_world()`` and ``load_world(town)``, so a
+    stand-in object can be used to exercise the daemon without a server.
+    """
+
+    def __init__(self, client, town: Optional[str] = None):
+        self.client = client
+        self.town = None
+        self.world = None
+        self._blueprint_library = None
+        if town:
+            self.load(town)
+
+    @classmethod
+    def connect(cls, ip: str = "localhost", port: int = 2000, timeout: float = 10.0, town: Optional[str] = None) -> "WarmSession":
+        import carla
+
+        client = carla.Client(ip, port)
+        client.set_timeout(timeout)
+        return cls(client, town=town)
+
+    def load(self, town: Optional[str]):
+        """Make ``town`` the current world, loading it only if it changed."""
+        if town and town != self.town:
+            print(f"daemon: loading {town}")
+            self.world = self.client.load_world(town)
+            self.town = town
+            self._blueprint_library = None
+        elif self.world is None:
+            self.world = self.client.get_world()
+        return self.world
+
+    def blueprint_library(self):
+        if self._blueprint_library is None:
+            self._blueprint_library = self.load(self.town).get_blueprint_library()
+        return self._blueprint_library
+
+
+def run_replay_job(session: WarmSession, argv: List[str]) -> Dict:
+    import main
+
+    args = main.build_parser().parse_args(argv)
+    session.load(args.town)
+    carla_control = main.CarlaControl(view=args.view, client=session.client,
+                                      capture_every=args.capture_every, profile=args.profile,
+                                      blueprint_library=session.blueprint_library())
+    finished = main.run_replay(carla_control, args, load_map=False, wait_for_enter=False)
+    video = main.video_path(args.scene, args.view)
+    return {
+        "finished": bool(finished),
+        "frames_dir": os.path.abspath("test"),
+        "checkpoint": os.path.abspath(args.checkpoint),
+        "render_stats": os.path.abspath(main.RENDER_STATS_FILE),
+        "video": os.path.abspath(video) if finished and os.path.exists(video) else None,
+    }
+
+
+def run_spawn_job(session: WarmSession, argv: List[str]) -> Dict:
+    import spawn_vehicles
+
+    args = spawn_vehicles.build_parser().parse_args(argv)
+    if args.keep_seconds is None:
+        raise ValueError("--keep-seconds is required for daemon spawn jobs")
+    world = session.load(args.town)
+    code = args.run(world, session.blueprint_library(), args)
+    return {"code": int(code)}
+
+
+DEFAULT_HANDLERS = {
+    "replay": run_replay_job,
+    "spawn": run_spawn_job,
+}
+
+
+class ReplayDaemon():
+    """HTTP front-end that runs jobs against a :class:`WarmSession`."""
+
+    def __init__(self, session: WarmSession, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 handlers: Optional[Dict[str, Callable[[WarmSession, List[str]], Dict]]] = None):
+        self.session = session
+        self.handlers = dict(DEFAULT_HANDLERS if handlers is None else handlers)
+        self.jobs = 0
+        self._job_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def status(self) -> Dict:
+        return {"town": self.session.town, "busy": self._job_lock.locked(), "jobs": self.jobs}
+
+    def run_job(self, kind: str, argv: List[str], cwd: Optional[str] = None) -> Dict:
+        """Run one job, inside ``cwd`` if given. Jobs hold a lock, so changing directory is safe."""
+        if kind not in self.handlers:
+            raise KeyError(f"Unknown job type: {kind}")
+        if cwd is not None and not os.path.isdir(cwd):
+            raise ValueError(f"cwd does not exist on the daemon host: {cwd}")
+        with self._job_lock:
+            prev = os.getcwd()
+            if cwd is not None:
+                os.chdir(cwd)
+            try:
+                result = self.handlers[kind](self.session, list(argv))
+            finally:
+                os.chdir(prev)
+            self.jobs += 1
+        return result
+
+    def serve_forever(self):
+        host, port = self.address[:2]
+        print(f"daemon: listening on http://{host}:{port}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def shutdown(self):
+        # serve_forever() blocks until shutdown() returns, so never call it from the serving thread.
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def _make_handler(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                print("daemon: " + format % args)
+
+            def _reply(self, code: int, payload: Dict):
+                body = json.dumps(payload).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/status":
+                    self._reply(200, daemon.status())
+                else:
+                    self._reply(404, {"error": f"Unknown path {self.path}"})
+
+            def do_POST(self):
+                if self.path == "/shutdown":
+                    self._reply(200, {"ok": True})
+                    daemon.shutdown()
+                    return
+                if not self.path.startswith("/jobs/"):
+                    self._reply(404, {"error": f"Unknown path {self.path}"})
+                    return
+                kind = self.path[len("/jobs/"):]
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    job = json.loads(self.rfile.read(length) or b"{}")
+                    argv = job.get("argv", [])
+                    if not isinstance(argv, list) or not all(isinstance(a, str) for a in argv):
+                        raise ValueError("argv must be a list of strings")
+                    cwd = job.get("cwd")
+                    if cwd is not None and not isinstance(cwd, str):
+                        raise ValueError("cwd must be a string")
+                except ValueError as e:
+                    self._reply(400, {"error": str(e)})
+                    return
+                try:
+                    result = daemon.run_job(kind, argv, cwd=cwd)
+                except KeyError as e:
+                    self._reply(404, {"error": str(e.args[0])})
+                except ValueError as e:
+                    self._reply(400, {"error": str(e)})
+                except SystemExit as e:
+                    # argparse exits on bad arguments
+                    self._reply(400, {"error": f"Invalid arguments (exit code {e.code})"})
+                except Exception as e:
+                    traceback.print_exc()
+                    self._reply(500, {"error": f"{type(e).__name__}: {e}"})
+                else:
+                    self._reply(200, result)
+
+        return Handler
+
+
+def submit(url: str, kind: str, argv: List[str], timeout: Optional[float] = None,
+           cwd: Optional[str] = None) -> Dict:
+    """Submit a job to a running daemon and return its JSON result.
+
+    The job runs in ``cwd`` (default: this process's working directory).
+    """
+    body = json.dumps({"argv": list(argv), "cwd": os.path.abspath(cwd or os.getcwd())}).encode()
+    req = urlrequest.Request(
+        url.rstrip("/") + f"/jobs/{kind}",
+        data=body,
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urlrequest.urlopen(req, timeout=timeout) as resp:
+            return json.loads(resp.read())
+    except urlerror.HTTPError as e:
+        try:
+            msg = json.loads(e.read()).get("error", e.reason)
+        except ValueError:
+            msg = e.reason
+        raise RuntimeError(f"Daemon rejected {kind} job ({e.code}): {msg}") from None
+
+
+def build_parser() -> argparse.ArgumentParser:
+    p = argparse.ArgumentParser(description="Keep a warm CARLA session and run replay/spawn jobs")
+    p.add_argument("--carla-ip", default="localhost")
+    p.add_argument("--carla-port", type=int, default=2000)
+    p.add_argument("--timeout", type=float, default=10.0)
+    p.add_argument("--town", default=None, help="Town to preload, e.g. Town06")
+    p.add_argument("--host", default=DEFAULT_HOST, help="Address to listen on")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    return p
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    session = WarmSession.connect(args.carla_ip, args.carla_port, timeout=args.timeout, town=args.town)
+    ReplayDaemon(session, host=args.host, port=args.port).serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
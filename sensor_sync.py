@@ -0,0 +1,145 @@
+"""Tick-aligned synchronous sensor capture.
+
+In synchronous mode every ``world.tick()`` returns the id of the frame it
+simulated. Camera callbacks, however, arrive asynchronously and a camera with
+``sensor_tick`` set only renders on some ticks. :class:`SensorSync` ties the
+two together:
+
+- capture decimation is declared up front (``capture_every`` ticks) and turned
+  into a ``sensor_tick`` so the server only renders the frames we keep;
+- each sensor's images go into its own queue, and after every tick the images
+  for that tick's frame id are collected, waiting up to ``timeout`` seconds on
+  ticks where a sensor is expected to deliver. Images that arrive after their
+  tick are still returned, tagged with their own frame id.
+"""
+
+import queue
+from typing import Dict, List, Optional, Tuple
+
+
+class SensorSync():
+    def __init__(self, fixed_delta_seconds: float, capture_every: int = 5, timeout: float = 2.0):
+        if capture_every < 1:
+            raise ValueError(f"capture_every must be >= 1, got {capture_every}")
+        self.fixed_delta_seconds = float(fixed_delta_seconds)
+        self.capture_every = int(capture_every)
+        self.timeout = float(timeout)
+        self._queues: Dict[str, queue.Queue] = {}
+        self._phase: Dict[str, Optional[int]] = {}
+        self.missed = 0
+        self.late = 0
+        self.drifted = 0
+        self.frame = None
+        self._floor = -1
+
+    @property
+    def sensor_tick(self) -> float:
+        """``sensor_tick`` attribute value that renders once every ``capture_every`` ticks.
+
+        Half a tick of slack keeps floating point accumulation on the server
+        from occasionally stretching the interval to ``capture_every + 1``.
+        """
+        if self.capture_every == 1:
+            return 0.0
+        return (self.capture_every - 0.5) * self.fixed_delta_seconds
+
+    def add_sensor(self, name: str, sensor) -> None:
+        q = queue.Queue()
+        sensor.listen(q.put)
+        self._queues[name] = q
+        self._phase[name] = None
+
+    def expects(self, name: str, frame: int) -> bool:
+        phase = self._phase[name]
+        return phase is not None and (frame - phase) % self.capture_every == 0
+
+    def prime(self, world, max_ticks: Optional[int] = None) -> None:
+        """Tick until every sensor has delivered an image, fixing its capture phase.
+
+        Callbacks arrive after ``world.tick()`` returns, so each tick waits up
+        to ``timeout`` seconds for an image of that frame (or a newer one). A
+        late image from an earlier tick still fixes the phase, since its frame
+        id says when it was rendered. Images from priming are not returned by
+        :meth:`collect`.
+        """
+        max_ticks = max_ticks or 2 * self.capture_every + 1
+        frame = None
+        for _ in range(max_ticks):
+            if all(p is not None for p in self._phase.values()):
+                break
+            frame = world.tick()
+            for name, q in self._queues.items():
+                if self._phase[name] is not None:
+                    continue
+                while True:
+                    try:
+                        image = q.get(timeout=self.timeout)
+                    except queue.Empty:
+                        break
+                    self._phase[name] = image.frame
+                    if image.frame >= frame:
+                        break
+        missing = [n for n, p in self._phase.items() if p is None]
+        if missing:
+            raise RuntimeError(f"Sensors {missing} produced no image within {max_ticks} ticks")
+        if frame is not None:
+            self._floor = frame
+
+    def tick(self, world) -> List[Tuple[str, object]]:
+        """Advance the world one tick and return the images collected for it; see :meth:`collect`."""
+        self.frame = world.tick()
+        return self.collect(self.frame)
+
+    def collect(self, frame: int) -> List[Tuple[str, object]]:
+        """[(sensor name, image)] delivered by ``frame``, oldest first.
+
+        Besides the image for ``frame`` itself this includes late images of
+        earlier frames, so ``image.frame`` may be smaller than ``frame``.
+        """
+        images = []
+        for name, q in self._queues.items():
+            expected = self.expects(name, frame)
+            late, image = self._take(q, frame, block=expected)
+            for old in late:
+                if self.expects(name, old.frame):
+                    # Arrived after we gave up waiting on its tick.
+                    self.missed = max(self.missed - 1, 0)
+                    self.late += 1
+                else:
+                    self.drifted += 1
+                    self._phase[name] = old.frame
+                images.append((name, old))
+            if image is None:
+                if expected:
+                    self.missed += 1
+                    print(f"Warning: sensor {name} delivered no image for frame {frame} within {self.timeout}s")
+                continue
+            if not expected:
+                # The sensor fired off schedule; follow it rather than waiting on the wrong frames.
+                self.drifted += 1
+                self._phase[name] = frame
+            images.append((name, image))
+        images.sort(key=lambda item: item[1].frame)
+        return images
+
+    def _take(self, q: queue.Queue, frame: int, block: bool):
+        """Return (late images, image for ``frame`` or None) from ``q``.
+
+        With ``block`` wait up to ``timeout`` seconds for ``frame``; otherwise
+        only take what has already arrived. Images newer than ``frame`` stay
+        queued for the next tick, images from priming are dropped.
+        """
+        late = []
+        while True:
+            try:
+                image = q.get(timeout=self.timeout) if block else q.get_nowait()
+            except queue.Empty:
+                return late, None
+            if image.frame <= self._floor:
+                continue
+            if image.frame == frame:
+                return late, image
+            if image.frame > frame:
+                q.put(image)
+                return late, None
+            late.append(image)
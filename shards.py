@@ -0,0 +1,194 @@
+"""Sharded tar archives for captured frames.
+
+Instead of one JPEG per file, frames are appended to size-bounded tar shards
+in the WebDataset layout: every sample is a group of members sharing a key,
+e.g. ``000000042.jpg`` and ``000000042.json``. Each shard is written as
+``<prefix>-NNNNNN.tar.part`` and renamed when it is finalized. Its index,
+``<prefix>-NNNNNN.idx.json``, maps each key to the byte offset and size of
+its members. A shard is visible to readers only once that index exists. A
+reader can then seek straight to any sample, and several readers can split
+the shards between them.
+"""
+
+import glob
+import io
+import json
+import os
+import re
+import tarfile
+import threading
+from typing import Dict, Iterator, List, Set, Tuple
+
+DEFAULT_PREFIX = "frames"
+DEFAULT_MAX_BYTES = 256 << 20
+
+
+def _shard_name(prefix: str, n: int) -> str:
+    return f"{prefix}-{n:06d}"
+
+
+def _finalized(out_dir: str, prefix: str) -> List[Tuple[int, str]]:
+    """[(shard number, index path)] of finalized shards, in order."""
+    pat = re.compile(re.escape(prefix) + r"-(\d{6})\.idx\.json$")
+    out = []
+    for p in glob.glob(os.path.join(out_dir, f"{prefix}-*.idx.json")):
+        m = pat.search(os.path.basename(p))
+        if m:
+            out.append((int(m.group(1)), p))
+    return sorted(out)
+
+
+class ShardWriter():
+    """Append samples to size-bounded tar shards. Safe to call from several threads."""
+
+    def __init__(self, out_dir: str, prefix: str = DEFAULT_PREFIX, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes <= 0:
+            raise ValueError(f"max_bytes must be positive, got {max_bytes}")
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.max_bytes = int(max_bytes)
+        done = _finalized(out_dir, prefix)
+        self._next_shard = done[-1][0] + 1 if done else 0
+        self._lock = threading.Lock()
+        self._tar = None
+        self._name = None
+        self._keys: Dict[str, Dict[str, List[int]]] = {}
+
+    def add(self, key: str, members: Dict[str, bytes]) -> None:
+        """Append one sample; ``members`` maps extension (e.g. 'jpg') to payload."""
+        with self._lock:
+            if self._tar is None:
+                self._open()
+            entry = self._keys.setdefault(key, {})
+            for ext, payload in members.items():
+                info = tarfile.TarInfo(f"{key}.{ext}")
+                info.size = len(payload)
+                header = len(info.tobuf(self._tar.format, self._tar.encoding, self._tar.errors))
+                data_offset = self._tar.offset + header
+                self._tar.addfile(info, io.BytesIO(payload))
+                entry[ext] = [data_offset, len(payload)]
+            if self._tar.offset >= self.max_bytes:
+                self._finalize()
+
+    def flush(self) -> None:
+        """Finalize the open shard so everything added so far is durable and readable."""
+        with self._lock:
+            if self._tar is not None:
+                self._finalize()
+
+    close = flush
+
+    def _open(self):
+        self._name = _shard_name(self.prefix, self._next_shard)
+        self._next_shard += 1
+        self._tar = tarfile.open(os.path.join(self.out_dir, self._name + ".tar.part"), "w", format=tarfile.USTAR_FORMAT)
+        self._keys = {}
+
+    def _finalize(self):
+        self._tar.close()
+        base = os.path.join(self.out_dir, self._name)
+        if not os.path.exists(base + ".tar.part"):
+            # Removed by clear() or prune() while open; its samples are gone with it.
+            print(f"Shard {self._name}.tar.part disappeared before it was finalized; dropped")
+            self._tar = None
+            self._name = None
+            self._keys = {}
+            return
+        os.replace(base + ".tar.part", base + ".tar")
+        tmp = base + ".idx.json.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"shard": self._name + ".tar", "keys": self._keys}, f)
+        os.replace(tmp, base + ".idx.json")
+        self._tar = None
+        self._name = None
+        self._keys = {}
+
+
+class ShardReader():
+    """Random access and sequential iteration over finalized shards.
+
+    Open one reader per worker; file handles are not shared between threads.
+    """
+
+    def __init__(self, out_dir: str, prefix: str = DEFAULT_PREFIX):
+        self.out_dir = out_dir
+        self.shards: List[Tuple[str, Dict[str, Dict[str, List[int]]]]] = []
+        self._where: Dict[str, int] = {}
+        self._handles: Dict[int, object] = {}
+        for _, idx_path in _finalized(out_dir, prefix):
+            with open(idx_path) as f:
+                idx = json.load(f)
+            i = len(self.shards)
+            self.shards.append((os.path.join(out_dir, idx["shard"]), idx["keys"]))
+            for key in idx["keys"]:
+                self._where[key] = i
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._where
+
+    def keys(self) -> List[str]:
+        return sorted(self._where)
+
+    def read(self, key: str, ext: str) -> bytes:
+        i = self._where[key]
+        offset, size = self.shards[i][1][key][ext]
+        f = self._handles.get(i)
+        if f is None:
+            f = self._handles[i] = open(self.shards[i][0], "rb")
+        f.seek(offset)
+        return f.read(size)
+
+    def iter_shard(self, i: int) -> Iterator[Tuple[str, Dict[str, bytes]]]:
+        """Yield (key, {ext: payload}) for shard ``i`` in write order."""
+        path, keys = self.shards[i]
+        with open(path, "rb") as f:
+            for key, members in sorted(keys.items(), key=lambda kv: min(o for o, _ in kv[1].values())):
+                sample = {}
+                for ext, (offset, size) in members.items():
+                    f.seek(offset)
+                    sample[ext] = f.read(size)
+                yield key, sample
+
+    def close(self):
+        for f in self._handles.values():
+            f.close()
+        self._handles = {}
+
+
+def has_shards(out_dir: str, prefix: str = DEFAULT_PREFIX) -> bool:
+    return bool(_finalized(out_dir, prefix))
+
+
+def clear(out_dir: str, prefix: str = DEFAULT_PREFIX) -> None:
+    """Remove every shard, partial shard and index in ``out_dir``."""
+    for pattern in (f"{prefix}-*.tar", f"{prefix}-*.tar.part", f"{prefix}-*.idx.json", f"{prefix}-*.idx.json.tmp"):
+        for p in glob.glob(os.path.join(out_dir, pattern)):
+            os.remove(p)
+
+
+def prune(out_dir: str, keep: Set[str], prefix: str = DEFAULT_PREFIX) -> int:
+    """Remove partial shards and any finalized shard holding keys outside ``keep``.
+
+    Checkpoints flush the open shard, so a shard is either fully covered by
+    the checkpoint or was written entirely after it. Returns the number of
+    shards removed.
+    """
+    removed = 0
+    for pattern in (f"{prefix}-*.tar.part", f"{prefix}-*.idx.json.tmp"):
+        for p in glob.glob(os.path.join(out_dir, pattern)):
+            os.remove(p)
+            removed += 1
+    for _, idx_path in _finalized(out_dir, prefix):
+        with open(idx_path) as f:
+            idx = json.load(f)
+        if set(idx["keys"]) - keep:
+            tar_path = os.path.join(out_dir, idx["shard"])
+            if os.path.exists(tar_path):
+                os.remove(tar_path)
+            os.remove(idx_path)
+            removed += 1
+    return removed
@@ -2,7 +2,8 @@
 """Spawn CARLA vehicles for debugging.
 
 Supports:
-- Spawning vehicles from dataset (player + NPCs at t=0)
+- Spawning vehicles from dataset (player + NPCs at any source frame, optionally
+  playing a window of frames)
 - Spawning vehicles from map spawn points
 - Spawning one-by-one (interactive) or all-at-once
 
@@ -10,21 +11,28 @@ Examples:
   # Spawn player + all NPCs from dataset (frame 0)
   python3 spawn_vehicles.py from-data --ip 10.16.90.246 --town Town06 --scene ChangeLane --mode all
 
+  # Spawn at source frame 40 and play through frame 60
+  python3 spawn_vehicles.py --ip 10.16.90.246 --town Town06 --sync from-data --scene Roundabout --start-frame 40 --end-frame 60
+
   # Spawn one-by-one (press Enter each time)
   python3 spawn_vehicles.py from-data --ip 10.16.90.246 --town Town06 --scene IntersectionMerge --mode one
 
   # Spawn N vehicles at map spawn points
   python3 spawn_vehicles.py from-map --ip 10.16.90.246 --town Town06 --count 10 --mode all
+
+  # Submit to a running replay daemon (see replay_daemon.py); --keep-seconds is required
+  python3 spawn_vehicles.py --daemon http://127.0.0.1:8765 --town Town06 --keep-seconds 5 from-data --scene ChangeLane
 """
 
 import argparse
-import math
+import sys
 import time
 from typing import List, Optional, Tuple
 
 import carla
 
 import data
+import trajectory
 
 
 IMPLIED_MIN_X = 103.92
@@ -63,8 +71,9 @@ def _spawn_actor(world: carla.World, bp: carla.ActorBlueprint, transform: carla.
         return None
 
 
-def _convert_highway_point_to_town(point: List[float], town_id: str) -> List[float]:
-    """Convert [frame, x, y, yaw(rad)] -> [frame, x, y, z, pitch, yaw(deg), roll]."""
+def _convert_highway_to_town(paths, town_id: str) -> trajectory.TrajectorySet:
+    """Convert dataset trajectories ([frame, x, y, yaw(rad)]) to town layout
+    [frame, x, y, z, pitch, yaw(deg), roll]."""
     if town_id in ("Town06", "Town06_Opt"):
         init_pose = [209, 66, 0.08]
         min_x = IMPLIED_MIN_X
@@ -74,26 +83,23 @@ def _convert_highway_point_to_town(point: List[float], town_id: str) -> List[flo
     else:
         raise ValueError(f"Unsupported town_id: {town_id}")
 
-    frame, x, y, yaw_rad = point
-    return [
-        frame,
-        x + init_pose[0] - min_x,
-        y + init_pose[1],
-        init_pose[2],
-        0.0,
-        float(yaw_rad) * 180.0 / math.pi,
-        0.0,
-    ]
+    return trajectory.to_town_layout(paths, init_pose, min_x=min_x)
 
 
-def _to_transform(p: List[float]) -> carla.Transform:
-    # p: [frame, x, y, z, pitch, yaw, roll]
+def _to_transform(path: trajectory.Trajectory, t: int) -> carla.Transform:
+    x, y, z, pitch, yaw, roll = path.pose(t)
     return carla.Transform(
-        carla.Location(x=float(p[1]), y=float(p[2]), z=float(p[3])),
-        carla.Rotation(pitch=float(p[4]), yaw=float(p[5]), roll=float(p[6])),
+        carla.Location(x=x, y=y, z=z),
+        carla.Rotation(pitch=pitch, yaw=yaw, roll=roll),
     )
 
 
+def _seek_town(index: data.SceneIndex, tick: int, town_id: str) -> trajectory.TrajectorySet:
+    """Town-space pose of every car at ``tick`` as one length-1 trajectory per car (car 0 is the player)."""
+    poses = index.at(tick)
+    return _convert_highway_to_town(trajectory.TrajectorySet.from_tensor(poses[:, None, :]), town_id)
+
+
 def _interactive_pause(i: int, label: str) -> bool:
     """Return False to stop."""
     try:
@@ -105,28 +111,43 @@ def _interactive_pause(i: int, label: str) -> bool:
     return True
 
 
-def cmd_from_data(args) -> int:
+def _connect(args) -> carla.World:
     client = carla.Client(args.ip, args.port)
     client.set_timeout(args.timeout)
+    return client.load_world(args.town) if args.town else client.get_world()
 
-    world = client.load_world(args.town) if args.town else client.get_world()
-    blueprint_library = world.get_blueprint_library()
 
+def _apply_sync(world: carla.World, args) -> None:
     if args.sync:
         settings = world.get_settings()
         settings.synchronous_mode = True
         settings.fixed_delta_seconds = 0.05
         world.apply_settings(settings)
 
-    # Load dataset
-    raw = data.data_mix(scene=args.scene)
-    hero, npcs = data.player_data_split(raw)
 
-    # Convert first frame positions
-    hero_pose = _convert_highway_point_to_town(hero[0], args.town)
-    npc_poses = [_convert_highway_point_to_town(path[0], args.town) for path in npcs]
+def cmd_from_data(args) -> int:
+    world = _connect(args)
+    return run_from_data(world, world.get_blueprint_library(), args)
+
+
+def run_from_data(world: carla.World, blueprint_library, args) -> int:
+    """Spawn from the dataset into an already loaded world (shared with the replay daemon)."""
+    _apply_sync(world, args)
+
+    # Load dataset and seek straight to the requested frame
+    index = data.SceneIndex(data.data_mix(scene=args.scene))
+    start_tick = index.frame_to_tick(args.start_frame)
+    end_tick = None if args.end_frame is None else index.frame_to_tick(args.end_frame)
+    if end_tick is not None and end_tick < start_tick:
+        print(f"--end-frame {args.end_frame} is before --start-frame {args.start_frame}.")
+        return 2
+
+    poses = _seek_town(index, start_tick, args.town)
+    hero_path = poses[0]
+    npc_paths = poses[1:]
 
     spawned: List[carla.Actor] = []
+    animated: List[Tuple[int, carla.Actor]] = []  # (car index in the scene, actor)
 
     try:
         # NPCs
@@ -138,21 +159,23 @@ def cmd_from_data(args) -> int:
             return 2
 
         if args.mode == "one":
-            for i, pose in enumerate(npc_poses):
+            for i, path in enumerate(npc_paths):
                 if not _interactive_pause(i, f"NPC[{i}]"):
                     break
-                actor = _spawn_actor(world, npc_bp, _to_transform(pose), name=f"NPC[{i}]")
+                actor = _spawn_actor(world, npc_bp, _to_transform(path, 0), name=f"NPC[{i}]")
                 if actor is not None:
                     actor.set_simulate_physics(False)
                     actor.set_enable_gravity(False)
                     spawned.append(actor)
+                    animated.append((i + 1, actor))
         else:
-            for i, pose in enumerate(npc_poses):
-                actor = _spawn_actor(world, npc_bp, _to_transform(pose), name=f"NPC[{i}]")
+            for i, path in enumerate(npc_paths):
+                actor = _spawn_actor(world, npc_bp, _to_transform(path, 0), name=f"NPC[{i}]")
                 if actor is not None:
                     actor.set_simulate_physics(False)
                     actor.set_enable_gravity(False)
                     spawned.append(actor)
+                    animated.append((i + 1, actor))
 
         # Player
         if args.include_player:
@@ -164,27 +187,37 @@ def cmd_from_data(args) -> int:
                 return 2
 
             if args.mode != "one" or _interactive_pause(999, "PLAYER"):
-                actor = _spawn_actor(world, player_bp, _to_transform(hero_pose), name="PLAYER")
+                actor = _spawn_actor(world, player_bp, _to_transform(hero_path, 0), name="PLAYER")
                 if actor is not None:
                     actor.set_simulate_physics(False)
                     actor.set_enable_gravity(False)
                     spawned.append(actor)
+                    animated.append((0, actor))
+
+        print(f"Spawned {len(spawned)} actors at frame {args.start_frame}.")
+        tick = start_tick
+
+        def step():
+            # Play the requested window one tick per world tick, then hold the last pose.
+            nonlocal tick
+            if end_tick is not None and tick < end_tick:
+                tick += 1
+                poses = _seek_town(index, tick, args.town)
+                for car, actor in animated:
+                    actor.set_transform(_to_transform(poses[car], 0))
+            if args.sync:
+                world.tick()
+            else:
+                world.wait_for_tick()
 
-        print(f"Spawned {len(spawned)} actors.")
         if args.keep_seconds is None:
             print("Keeping actors alive. Ctrl-C to cleanup.")
             while True:
-                if args.sync:
-                    world.tick()
-                else:
-                    world.wait_for_tick()
+                step()
         else:
             end = time.time() + float(args.keep_seconds)
             while time.time() < end:
-                if args.sync:
-                    world.tick()
-                else:
-                    world.wait_for_tick()
+                step()
 
         return 0
 
@@ -200,17 +233,13 @@ def cmd_from_data(args) -> int:
 
 
 def cmd_from_map(args) -> int:
-    client = carla.Client(args.ip, args.port)
-    client.set_timeout(args.timeout)
+    world = _connect(args)
+    return run_from_map(world, world.get_blueprint_library(), args)
 
-    world = client.load_world(args.town) if args.town else client.get_world()
-    blueprint_library = world.get_blueprint_library()
 
-    if args.sync:
-        settings = world.get_settings()
-        settings.synchronous_mode = True
-        settings.fixed_delta_seconds = 0.05
-        world.apply_settings(settings)
+def run_from_map(world: carla.World, blueprint_library, args) -> int:
+    """Spawn at map spawn points of an already loaded world (shared with the replay daemon)."""
+    _apply_sync(world, args)
 
     bp, pattern, candidates = _resolve_blueprint(blueprint_library, args.model)
     if bp is None:
@@ -283,28 +312,37 @@ def build_parser() -> argparse.ArgumentParser:
     p.add_argument("--mode", choices=["one", "all"], default="all")
     p.add_argument("--keep-seconds", type=float, default=None, help="How long to keep actors alive (default: until Ctrl-C)")
     p.add_argument("--sync", action="store_true", help="Enable synchronous mode")
+    p.add_argument("--daemon", default=None, help="Submit the job to a running replay daemon, e.g. http://127.0.0.1:8765")
 
     sub = p.add_subparsers(dest="cmd", required=True)
 
-    p_data = sub.add_parser("from-data", help="Spawn from dataset at frame 0")
+    p_data = sub.add_parser("from-data", help="Spawn from dataset at a source frame")
     p_data.add_argument("--scene", default="ChangeLane")
+    p_data.add_argument("--start-frame", type=int, default=0, help="Source frame to spawn at")
+    p_data.add_argument("--end-frame", type=int, default=None, help="Play actors through to this source frame, then hold")
     p_data.add_argument("--npc-model", default="model3")
     p_data.add_argument("--player-model", default="audi")
     p_data.add_argument("--include-player", dest="include_player", action="store_true", default=True)
     p_data.add_argument("--no-player", dest="include_player", action="store_false", help="Do not spawn the player vehicle")
-    p_data.set_defaults(func=cmd_from_data)
+    p_data.set_defaults(func=cmd_from_data, run=run_from_data)
 
     p_map = sub.add_parser("from-map", help="Spawn at CARLA map spawn points")
     p_map.add_argument("--model", default="model3")
     p_map.add_argument("--count", type=int, default=10)
-    p_map.set_defaults(func=cmd_from_map)
+    p_map.set_defaults(func=cmd_from_map, run=run_from_map)
 
     return p
 
 
-def main() -> int:
+def main(argv: Optional[List[str]] = None) -> int:
     parser = build_parser()
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.daemon:
+        import replay_daemon
+
+        result = replay_daemon.submit(args.daemon, "spawn", list(sys.argv[1:] if argv is None else argv))
+        print(f"Daemon result: {result}")
+        return int(result.get("code", 1))
     return int(args.func(args))
 
 
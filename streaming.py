@@ -0,0 +1,113 @@
+"""Distance-based NPC streaming around the hero vehicle.
+
+Large scenes can contain far more vehicles than the camera ever sees at once.
+Instead of spawning every NPC at t=0, the replay can keep only the NPCs within
+a radius of the hero (and therefore of the cameras attached to it) alive.
+NPCs spawn once they come within ``radius`` and despawn once they are further
+than ``radius + hysteresis`` away, so cars hovering on the boundary do not
+flicker in and out every tick.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from trajectory import TrajectorySet
+
+
+def camera_coverage_radius(height: float, fov_deg: float, aspect: float = 16 / 9) -> float:
+    """Ground-plane radius covered by a camera looking straight down.
+
+    ``fov_deg`` is CARLA's horizontal field of view; the returned value is the
+    distance from the hero to the corner of the visible rectangle.
+    """
+    half_w = height * math.tan(math.radians(fov_deg) / 2.0)
+    half_h = half_w / aspect
+    return math.hypot(half_w, half_h)
+
+
+def compute_distances(hero_path, npc_paths) -> np.ndarray:
+    """Precompute planar hero->NPC distances for every tick.
+
+    hero_path: Trajectory, npc_paths: TrajectorySet (or anything
+    ``TrajectorySet.coerce`` accepts) with ``x``/``y`` fields.
+    Returns a float32 array of shape (num_npcs, len(hero_path)). NPC paths
+    shorter than the hero path hold their last pose, matching ``play_video``;
+    empty paths are infinitely far away.
+    """
+    npcs = TrajectorySet.coerce(npc_paths, hero_path.fields)
+    T = len(hero_path)
+    rows = npcs.rows_at(np.arange(T))
+    valid = rows >= 0
+    rows = np.maximum(rows, 0)
+    if len(npcs.data) == 0:
+        return np.full((len(npcs), T), np.inf, dtype=np.float32)
+    dx = npcs.field("x")[rows] - hero_path.field("x")[None, :]
+    dy = npcs.field("y")[rows] - hero_path.field("y")[None, :]
+    dist = np.hypot(dx, dy).astype(np.float32)
+    dist[~valid] = np.inf
+    return dist
+
+
+class ActorStreamer():
+    """Decide per tick which NPCs should be spawned or destroyed."""
+
+    def __init__(self, distances: np.ndarray, radius: float, hysteresis: float = 10.0,
+                 max_backoff: int = 128):
+        if radius <= 0:
+            raise ValueError(f"radius must be positive, got {radius}")
+        if hysteresis < 0:
+            raise ValueError(f"hysteresis must be non-negative, got {hysteresis}")
+        self.distances = distances
+        self.radius = float(radius)
+        self.despawn_radius = float(radius) + float(hysteresis)
+        self.active = np.zeros(distances.shape[0], dtype=bool)
+        # Failed spawns are retried with exponential backoff (in ticks) up to max_backoff.
+        self.max_backoff = int(max_backoff)
+        self.failures = np.zeros(distances.shape[0], dtype=np.int32)
+        self.retry_at = np.zeros(distances.shape[0], dtype=np.int64)
+
+    def step(self, tick: int) -> Tuple[List[int], List[int]]:
+        """Return (to_spawn, to_despawn) NPC indices for ``tick``.
+
+        The active set is updated optimistically; call :meth:`drop` for any
+        NPC that failed to spawn so it is retried after a backoff.
+        """
+        ready = self.retry_at <= tick
+        tick = min(tick, self.distances.shape[1] - 1)
+        d = self.distances[:, tick]
+        spawn = np.flatnonzero(~self.active & ready & (d <= self.radius))
+        despawn = np.flatnonzero(self.active & (d > self.despawn_radius))
+        self.active[spawn] = True
+        self.active[despawn] = False
+        return spawn.tolist(), despawn.tolist()
+
+    def drop(self, index: int, tick: int):
+        """Mark NPC ``index`` as not spawned at ``tick``; retry after 1, 2, 4, ... ticks."""
+        self.active[index] = False
+        self.failures[index] += 1
+        self.retry_at[index] = tick + min(1 << min(int(self.failures[index]) - 1, 30), self.max_backoff)
+
+    def active_indices(self) -> List[int]:
+        return np.flatnonzero(self.active).tolist()
+
+
+def make_streamer(hero_path, npc_paths, radius: Optional[float], hysteresis: float = 10.0,
+                  camera_height: Optional[float] = None, fov_deg: float = 110.0,
+                  aspect: float = 16 / 9) -> Optional[ActorStreamer]:
+    """Build an :class:`ActorStreamer`, or return None when streaming is disabled.
+
+    When ``camera_height`` is given (top-down view), the radius is widened so it
+    never falls inside the camera footprint.
+
+    Only the top-down view gets this floor. The Front camera is tilted 15
+    degrees down with a wide FOV, so its frustum reaches the horizon and no
+    radius keeps every visible car alive. For that view ``radius`` is used
+    as given: cars beyond it are not drawn even when they are in frame.
+    """
+    if radius is None:
+        return None
+    if camera_height is not None:
+        radius = max(radius, camera_coverage_radius(camera_height, fov_deg, aspect))
+    return ActorStreamer(compute_distances(hero_path, npc_paths), radius, hysteresis)
@@ -0,0 +1,223 @@
+"""Stand-in for the ``carla`` module and a CARLA server, for tests.
+
+Only the parts of the API that main.py, spawn_vehicles.py and
+replay_daemon.py use are implemented. :func:`install` registers this module
+as ``carla`` when the real client library is not importable, so those
+modules can be imported and driven end to end without a server.
+
+Cameras render on ``world.tick()`` following ``sensor_tick`` like the
+server does, and hand their images to the ``listen`` callback.
+"""
+
+import fnmatch
+import itertools
+import sys
+import types
+
+_ids = itertools.count(1)
+
+
+class Location():
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = float(x), float(y), float(z)
+
+
+class Rotation():
+    def __init__(self, pitch=0.0, yaw=0.0, roll=0.0):
+        self.pitch, self.yaw, self.roll = float(pitch), float(yaw), float(roll)
+
+
+class Transform():
+    def __init__(self, location=None, rotation=None):
+        self.location = location or Location()
+        self.rotation = rotation or Rotation()
+
+
+MapLayer = types.SimpleNamespace(**{name: name for name in (
+    "NONE", "Buildings", "Decals", "Foliage", "Ground", "ParkedVehicles",
+    "Particles", "Props", "StreetLights", "Walls", "All",
+)})
+
+
+class ActorBlueprint():
+    def __init__(self, id, attributes=()):
+        self.id = id
+        self.attributes = {key: "" for key in attributes}
+
+    def has_attribute(self, key):
+        return key in self.attributes
+
+    def set_attribute(self, key, value):
+        if key not in self.attributes:
+            raise IndexError(key)
+        self.attributes[key] = value
+
+
+class BlueprintLibrary(list):
+    def filter(self, pattern):
+        return BlueprintLibrary(bp for bp in self if fnmatch.fnmatch(bp.id, pattern))
+
+    def find(self, id):
+        for bp in self:
+            if bp.id == id:
+                return bp
+        raise IndexError(id)
+
+
+CAMERA_ATTRIBUTES = ("image_size_x", "image_size_y", "fov", "sensor_tick",
+                     "enable_postprocess_effects", "motion_blur_intensity")
+
+
+def default_blueprints():
+    return BlueprintLibrary([
+        ActorBlueprint("vehicle.tesla.model3"),
+        ActorBlueprint("vehicle.audi.tt"),
+        ActorBlueprint("sensor.camera.rgb", CAMERA_ATTRIBUTES),
+    ])
+
+
+class Image():
+    def __init__(self, frame, width, height):
+        self.frame = frame
+        self.width = width
+        self.height = height
+        self.raw_data = bytes(width * height * 4)
+
+
+class Actor():
+    def __init__(self, world, blueprint, transform, parent=None):
+        self.id = next(_ids)
+        self.world = world
+        self.type_id = blueprint.id
+        self.attributes = dict(blueprint.attributes)
+        self.transform = transform
+        self.parent = parent
+        self.alive = True
+        self._callback = None
+        self._since_capture = None
+
+    def get_location(self):
+        return self.transform.location
+
+    def set_transform(self, transform):
+        self.transform = transform
+
+    def set_simulate_physics(self, enabled):
+        pass
+
+    def set_enable_gravity(self, enabled):
+        pass
+
+    def listen(self, callback):
+        self._callback = callback
+
+    def destroy(self):
+        self.alive = False
+        return True
+
+    def _render(self, frame, dt):
+        """Called by World.tick() for cameras; honours sensor_tick like the server."""
+        if self._callback is None:
+            return
+        sensor_tick = float(self.attributes.get("sensor_tick") or 0.0)
+        if self._since_capture is not None:
+            self._since_capture += dt
+            if self._since_capture + 1e-9 < sensor_tick:
+                return
+        self._since_capture = 0.0
+        self._callback(Image(frame, int(self.attributes["image_size_x"]), int(self.attributes["image_size_y"])))
+
+
+class ActorList(list):
+    def filter(self, pattern):
+        return ActorList(a for a in self if fnmatch.fnmatch(a.type_id, pattern))
+
+
+class WorldSettings():
+    def __init__(self):
+        self.synchronous_mode = False
+        self.fixed_delta_seconds = None
+
+
+class World():
+    """A world that accepts every spawn and renders blank camera images.
+
+    fail_at_frame: raise RuntimeError from tick() once this frame is reached,
+    to simulate a server that goes away mid-replay.
+    """
+
+    def __init__(self, town="Town10HD"):
+        self.town = town
+        self.frame = 0
+        self.settings = WorldSettings()
+        self.actors = []
+        self.unloaded_layers = set()
+        self.fail_at_frame = None
+        self._blueprints = default_blueprints()
+
+    def get_settings(self):
+        return self.settings
+
+    def apply_settings(self, settings):
+        self.settings = settings
+        return self.frame
+
+    def get_blueprint_library(self):
+        return self._blueprints
+
+    def load_map_layer(self, layer):
+        self.unloaded_layers.discard(layer)
+
+    def unload_map_layer(self, layer):
+        self.unloaded_layers.add(layer)
+
+    def try_spawn_actor(self, blueprint, transform, attach_to=None):
+        actor = Actor(self, blueprint, transform, parent=attach_to)
+        self.actors.append(actor)
+        return actor
+
+    def spawn_actor(self, blueprint, transform, attach_to=None):
+        return self.try_spawn_actor(blueprint, transform, attach_to=attach_to)
+
+    def get_actors(self):
+        return ActorList(a for a in self.actors if a.alive)
+
+    def tick(self, seconds=10.0):
+        self.frame += 1
+        if self.fail_at_frame is not None and self.frame >= self.fail_at_frame:
+            raise RuntimeError(f"fake server stopped at frame {self.frame}")
+        dt = self.settings.fixed_delta_seconds or 0.05
+        for actor in self.get_actors():
+            actor._render(self.frame, dt)
+        return self.frame
+
+    def wait_for_tick(self, seconds=10.0):
+        return self.tick(seconds)
+
+
+class Client():
+    def __init__(self, host="localhost", port=2000):
+        self.host = host
+        self.port = port
+        self.world = World()
+        self.loads = []
+
+    def set_timeout(self, seconds):
+        pass
+
+    def get_world(self):
+        return self.world
+
+    def load_world(self, town):
+        self.loads.append(town)
+        self.world = World(town)
+        return self.world
+
+
+def install():
+    """Register this module as ``carla`` unless the real one is importable; return the module in use."""
+    try:
+        import carla
+    except ImportError:
+        carla = sys.modules["carla"] = sys.modules[__name__]
+    return carla
@@ -0,0 +1,73 @@
+import types
+
+import pytest
+
+import render_profiles
+
+FakeMapLayer = types.SimpleNamespace(**{name: name for name in render_profiles.MAP_LAYERS})
+
+
+class FakeWorld():
+    """Tracks which map layers are loaded, like a layered (_Opt) CARLA map."""
+
+    def __init__(self):
+        self.loaded = set(render_profiles.MAP_LAYERS)
+
+    def load_map_layer(self, layer):
+        self.loaded.add(layer)
+
+    def unload_map_layer(self, layer):
+        self.loaded.discard(layer)
+
+
+class FakeBlueprint():
+    def __init__(self, attributes=("image_size_x", "image_size_y", "fov", "sensor_tick",
+                                   "enable_postprocess_effects", "motion_blur_intensity")):
+        self.known = set(attributes)
+        self.attributes = {}
+
+    def has_attribute(self, key):
+        return key in self.known
+
+    def set_attribute(self, key, value):
+        if key not in self.known:
+            raise IndexError(key)
+        self.attributes[key] = value
+
+
+def test_apply_map_layers_unloads_profile_layers():
+    world = FakeWorld()
+    render_profiles.apply_map_layers(world, render_profiles.get_profile("review"), map_layers=FakeMapLayer)
+    assert world.loaded == set(render_profiles.MAP_LAYERS) - {"Buildings"}
+
+
+def test_apply_map_layers_restores_layers_between_profiles():
+    world = FakeWorld()
+    render_profiles.apply_map_layers(world, render_profiles.get_profile("preview"), map_layers=FakeMapLayer)
+    assert world.loaded == {"Ground"}
+    render_profiles.apply_map_layers(world, render_profiles.get_profile("final"), map_layers=FakeMapLayer)
+    assert world.loaded == set(render_profiles.MAP_LAYERS) - {"Buildings"}
+
+
+def test_apply_camera():
+    bp = FakeBlueprint()
+    render_profiles.apply_camera(bp, render_profiles.get_profile("final"), 0.045)
+    assert bp.attributes == {
+        "image_size_x": "1920",
+        "image_size_y": "1080",
+        "fov": "110",
+        "sensor_tick": "0.045",
+        "enable_postprocess_effects": "True",
+        "motion_blur_intensity": "0.0",
+    }
+
+
+def test_apply_camera_skips_unknown_attributes():
+    bp = FakeBlueprint(attributes=("image_size_x", "image_size_y", "fov", "sensor_tick"))
+    render_profiles.apply_camera(bp, render_profiles.get_profile("preview"), 0.0)
+    assert bp.attributes == {"image_size_x": "640", "image_size_y": "360", "fov": "110", "sensor_tick": "0.0"}
+
+
+def test_get_profile_rejects_unknown_name():
+    with pytest.raises(ValueError, match="Unknown render profile"):
+        render_profiles.get_profile("ultra")
@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+from urllib import request as urlrequest
+
+import pytest
+
+import fake_carla
+import replay_daemon
+
+fake_carla.install()
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeWorld():
+    def __init__(self, town):
+        self.town = town
+        self.blueprint_calls = 0
+
+    def get_blueprint_library(self):
+        self.blueprint_calls += 1
+        return ["vehicle.tesla.model3", "vehicle.audi.tt"]
+
+
+class FakeClient():
+    """Stand-in for carla.Client: only what WarmSession uses."""
+
+    def __init__(self):
+        self.loads = []
+        self.world = FakeWorld("Town10HD")
+
+    def get_world(self):
+        return self.world
+
+    def load_world(self, town):
+        self.loads.append(town)
+        self.world = FakeWorld(town)
+        return self.world
+
+
+def town_job(session, argv):
+    town = argv[0] if argv else None
+    session.load(town)
+    return {"town": session.town, "blueprints": len(session.blueprint_library()), "cwd": os.getcwd()}
+
+
+def failing_job(session, argv):
+    raise RuntimeError("boom")
+
+
+def argparse_job(session, argv):
+    raise SystemExit(2)
+
+
+@pytest.fixture
+def daemon():
+    client = FakeClient()
+    d = replay_daemon.ReplayDaemon(
+        replay_daemon.WarmSession(client, town="Town06"), port=0,
+        handlers={"town": town_job, "fail": failing_job, "args": argparse_job},
+    )
+    thread = threading.Thread(target=d.serve_forever, daemon=True)
+    thread.start()
+    host, port = d.address[:2]
+    yield d, f"http://{host}:{port}", client
+    d.shutdown()
+    thread.join(timeout=5)
+
+
+def get_json(url):
+    with urlrequest.urlopen(url, timeout=5) as resp:
+        return json.loads(resp.read())
+
+
+def test_status(daemon):
+    d, url, client = daemon
+    assert get_json(url + "/status") == {"town": "Town06", "busy": False, "jobs": 0}
+    assert client.loads == ["Town06"]
+
+
+def test_job_round_trip_reuses_session(daemon, tmp_path):
+    d, url, client = daemon
+    first = replay_daemon.submit(url, "town", ["Town06"], timeout=5, cwd=str(tmp_path))
+    second = replay_daemon.submit(url, "town", ["Town06"], timeout=5, cwd=str(tmp_path))
+    assert first["town"] == second["town"] == "Town06"
+    assert first["blueprints"] == 2
+    # The town is loaded once and the blueprint library is cached across jobs.
+    assert client.loads == ["Town06"]
+    assert client.world.blueprint_calls == 1
+    assert get_json(url + "/status")["jobs"] == 2
+
+
+def test_job_changes_town(daemon, tmp_path):
+    d, url, client = daemon
+    assert replay_daemon.submit(url, "town", ["Town03"], timeout=5, cwd=str(tmp_path))["town"] == "Town03"
+    assert client.loads == ["Town06", "Town03"]
+    assert get_json(url + "/status")["town"] == "Town03"
+
+
+def test_job_runs_in_client_cwd(daemon, tmp_path):
+    d, url, client = daemon
+    before = os.getcwd()
+    result = replay_daemon.submit(url, "town", [], timeout=5, cwd=str(tmp_path))
+    assert os.path.realpath(result["cwd"]) == os.path.realpath(str(tmp_path))
+    assert os.getcwd() == before
+
+
+@pytest.mark.parametrize("kind, argv, cwd, message", [
+    ("missing", [], None, "(404)"),
+    ("fail", [], None, "(500): RuntimeError: boom"),
+    ("args", ["--bogus"], None, "(400)"),
+    ("town", [], "/does/not/exist", "(400): cwd does not exist"),
+])
+def test_job_errors(daemon, kind, argv, cwd, message):
+    d, url, client = daemon
+    with pytest.raises(RuntimeError, match=message.replace("(", r"\(").replace(")", r"\)")):
+        replay_daemon.submit(url, kind, argv, timeout=5, cwd=cwd)
+    assert get_json(url + "/status")["busy"] is False
+
+
+def test_rejects_bad_argv(daemon):
+    d, url, client = daemon
+    req = urlrequest.Request(url + "/jobs/town", data=json.dumps({"argv": "Town06"}).encode(), method="POST")
+    with pytest.raises(Exception) as err:
+        urlrequest.urlopen(req, timeout=5)
+    assert err.value.code == 400
+
+
+@pytest.fixture
+def carla_daemon():
+    """A daemon with the real job handlers, backed by the fake CARLA server."""
+    client = fake_carla.Client()
+    d = replay_daemon.ReplayDaemon(replay_daemon.WarmSession(client, town="Town06"), port=0)
+    thread = threading.Thread(target=d.serve_forever, daemon=True)
+    thread.start()
+    host, port = d.address[:2]
+    yield d, f"http://{host}:{port}", client
+    d.shutdown()
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def workdir(tmp_path):
+    """A client working directory with the repo's scenes under data/."""
+    os.symlink(os.path.join(REPO, "data"), tmp_path / "data")
+    return tmp_path
+
+
+def test_spawn_job_runs_real_handler(carla_daemon, workdir):
+    d, url, client = carla_daemon
+    argv = ["--town", "Town06", "--sync", "--keep-seconds", "0",
+            "from-data", "--scene", "IntersectionMerge", "--start-frame", "10"]
+    assert replay_daemon.submit(url, "spawn", argv, timeout=30, cwd=str(workdir)) == {"code": 0}
+    world = client.world
+    vehicles = [a for a in world.actors if a.type_id.startswith("vehicle.")]
+    # IntersectionMerge has 11 cars; all spawned into the warm world and cleaned up again.
+    assert len(vehicles) == 11
+    assert not any(a.alive for a in vehicles)
+    assert world.settings.synchronous_mode
+    assert client.loads == ["Town06"]
+
+
+def test_spawn_job_requires_keep_seconds(carla_daemon, workdir):
+    d, url, client = carla_daemon
+    with pytest.raises(RuntimeError, match="--keep-seconds is required"):
+        replay_daemon.submit(url, "spawn", ["--town", "Town06", "from-data"], timeout=30, cwd=str(workdir))
+
+
+REPLAY_ARGV = ["--town", "Town06", "--scene", "IntersectionMerge", "--view", "Top", "--profile", "preview",
+               "--end-frame", "3", "--validate", "off", "--checkpoint-every", "10"]
+
+
+@pytest.mark.parametrize("output", ["jpeg", "shards"])
+def test_replay_job_runs_real_handler(carla_daemon, workdir, output):
+    pytest.importorskip("cv2")
+    d, url, client = carla_daemon
+    result = replay_daemon.submit(url, "replay", REPLAY_ARGV + ["--output", output], timeout=60, cwd=str(workdir))
+    assert result["finished"] is True
+    assert result["video"] == str(workdir / "highway2carla_IntersectionMerge_Top.mp4")
+    assert os.path.exists(result["video"])
+    with open(result["checkpoint"]) as f:
+        state = json.load(f)
+    # 3 source frames upsampled 20x -> 61 ticks; the preview profile captures every 10th.
+    assert state["complete"] and state["profile"] == "preview" and state["output"] == output
+    assert [f[0] for f in state["frames"]] == list(range(len(state["frames"])))
+    assert len(state["frames"]) == 6
+    # The warm session is reused: no reload, and the world is left without actors.
+    assert client.loads == ["Town06"]
+    assert not client.world.get_actors()
+
+
+@pytest.mark.parametrize("output", ["jpeg", "shards"])
+def test_replay_job_resumes_after_failure(carla_daemon, workdir, output):
+    pytest.importorskip("cv2")
+    d, url, client = carla_daemon
+    argv = REPLAY_ARGV + ["--output", output]
+    client.world.fail_at_frame = client.world.frame + 45
+    with pytest.raises(RuntimeError, match="fake server stopped"):
+        replay_daemon.submit(url, "replay", argv, timeout=60, cwd=str(workdir))
+    with open(workdir / "test" / "checkpoint.json") as f:
+        assert not json.load(f)["complete"]
+    # The failed job must not leave writer threads or an open shard to the next one.
+    import main
+    assert main._pending_writes == [] and main._shard_writer is None
+    assert not list((workdir / "test").glob("*.part"))
+
+    client.world.fail_at_frame = None
+    result = replay_daemon.submit(url, "replay", argv + ["--resume"], timeout=60, cwd=str(workdir))
+    assert result["finished"] is True
+    with open(result["checkpoint"]) as f:
+        frames = json.load(f)["frames"]
+    seqs = [f[0] for f in frames]
+    assert seqs == list(range(len(seqs)))
+    ticks = [f[2] for f in frames]
+    assert ticks == sorted(set(ticks))
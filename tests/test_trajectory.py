@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+import data
+import trajectory
+from trajectory import Trajectory, TrajectorySet
+
+
+def reference_route_extend(path, sp_num):
+    """The original per-point loop that data.route_extend replaced."""
+    ans = []
+    count_turn = 0
+    for t in range(1, len(path)):
+        delta_x = path[t][1] - path[t - 1][1]
+        delta_y = path[t][2] - path[t - 1][2]
+        delta_theta = path[t][3] - path[t - 1][3]
+        for count in range(sp_num):
+            count_turn += 1
+            ans.append([count_turn, path[t - 1][1] + delta_x * count / sp_num,
+                        path[t - 1][2] + delta_y * count / sp_num, path[t - 1][3] + delta_theta * count / sp_num])
+    final_point = list(path[len(path) - 1])
+    final_point[0] = count_turn + 1
+    ans.append(final_point)
+    return np.array(ans)
+
+
+@pytest.fixture
+def scene():
+    """(T=4, N=3, 4) [frame, x, y, yaw] with distinct motion per car."""
+    t = np.arange(4, dtype=np.float64)[:, None]
+    cars = np.arange(3, dtype=np.float64)[None, :]
+    out = np.empty((4, 3, 4))
+    out[..., 0] = 100 + t
+    out[..., 1] = 10 * cars + 3.0 * t ** 2
+    out[..., 2] = -2.5 * cars + 0.5 * t
+    out[..., 3] = 0.1 * cars - 0.2 * t
+    return out
+
+
+def test_route_extend_matches_loop(scene):
+    for car in range(scene.shape[1]):
+        np.testing.assert_allclose(data.route_extend(scene[:, car], 5), reference_route_extend(scene[:, car], 5))
+
+
+def test_route_extend_batched(scene):
+    batched = data.route_extend(scene.transpose(1, 0, 2), 5)
+    assert batched.shape == (3, 16, 4)
+    for car in range(3):
+        np.testing.assert_allclose(batched[car], data.route_extend(scene[:, car], 5))
+
+
+def test_route_extend_single_point():
+    out = data.route_extend([[7, 1.0, 2.0, 0.5]], 5)
+    np.testing.assert_array_equal(out, [[1, 1.0, 2.0, 0.5]])
+
+
+def test_player_data_split_matches_loop(scene):
+    player, npcs = data.player_data_split(scene)
+    assert isinstance(player, Trajectory) and isinstance(npcs, TrajectorySet)
+    assert player.data.dtype == trajectory.TRAJECTORY_DTYPE
+    assert len(npcs) == 2
+    np.testing.assert_allclose(player.data, reference_route_extend(scene[:, 0], data.SP_NUM), rtol=1e-6)
+    for i, path in enumerate(npcs):
+        np.testing.assert_allclose(path.data, reference_route_extend(scene[:, i + 1], data.SP_NUM), rtol=1e-6)
+
+
+def test_scene_index_at_matches_split(scene):
+    index = data.SceneIndex(scene, sp_num=5)
+    extended = data.route_extend(scene.transpose(1, 0, 2), 5)
+    assert index.num_ticks == extended.shape[1]
+    for tick in range(index.num_ticks):
+        np.testing.assert_allclose(index.at(tick), extended[:, tick])
+    with pytest.raises(IndexError):
+        index.at(index.num_ticks)
+
+
+def test_scene_index_window(scene):
+    index = data.SceneIndex(scene, sp_num=5)
+    np.testing.assert_array_equal(index.frames(1, 2), scene[1:3])
+    np.testing.assert_allclose(index.at_frame(2), index.at(10))
+    with pytest.raises(ValueError):
+        index.frames(2, 1)
+
+
+@pytest.fixture
+def ragged():
+    paths = [np.arange(12, dtype=np.float64).reshape(3, 4), np.zeros((0, 4)), np.arange(4, dtype=np.float64).reshape(1, 4) + 50]
+    return TrajectorySet.from_paths(paths)
+
+
+def test_rows_at_ragged_and_empty(ragged):
+    np.testing.assert_array_equal(ragged.offsets, [0, 3, 3, 4])
+    np.testing.assert_array_equal(ragged.rows_at(0), [0, -1, 3])
+    # Past the end every actor holds its last row.
+    np.testing.assert_array_equal(ragged.rows_at(5), [2, -1, 3])
+    np.testing.assert_array_equal(ragged.rows_at([0, 1, 2, 9]), [[0, 1, 2, 2], [-1, -1, -1, -1], [3, 3, 3, 3]])
+
+
+def test_at_ragged_and_empty(ragged):
+    poses = ragged.at(1)
+    np.testing.assert_array_equal(poses[0], [4, 5, 6, 7])
+    assert np.isnan(poses[1]).all()
+    np.testing.assert_array_equal(poses[2], [50, 51, 52, 53])
+
+
+def test_rows_at_all_empty():
+    empty = TrajectorySet.from_paths([np.zeros((0, 4)), np.zeros((0, 4))])
+    np.testing.assert_array_equal(empty.rows_at(3), [-1, -1])
+    assert np.isnan(empty.at(3)).all()
+
+
+def test_slicing_shares_data(ragged):
+    tail = ragged[1:]
+    assert len(tail) == 2 and len(tail[0]) == 0
+    np.testing.assert_array_equal(tail[1].data, ragged[2].data)
+    assert np.shares_memory(tail.data, ragged.data)
+
+
+def test_pose_empty_trajectory(ragged):
+    with pytest.raises(ValueError):
+        ragged[1].pose(0)
+    assert ragged[0].pose(10) == (9.0, 10.0, 11.0)
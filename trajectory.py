@@ -0,0 +1,206 @@
+"""Compact trajectory containers shared by data.py, main.py and spawn_vehicles.py.
+
+A :class:`Trajectory` is one actor's path stored as a single (T, F) float
+array whose columns are named by ``fields``. A :class:`TrajectorySet` packs
+several (possibly ragged) trajectories into one contiguous (sum(T), F) array
+plus per-actor offsets, so indexing an actor or a tick never copies data.
+
+Two column layouts are used throughout the repo:
+
+- ``HIGHWAY_FIELDS``: dataset space, ``[frame, x, y, yaw(rad)]``
+- ``TOWN_FIELDS``: CARLA town space, ``[frame, x, y, z, pitch, yaw(deg), roll]``
+"""
+
+import math
+from typing import Iterable, Iterator, Sequence, Tuple, Union
+
+import numpy as np
+
+HIGHWAY_FIELDS = ("frame", "x", "y", "yaw")
+TOWN_FIELDS = ("frame", "x", "y", "z", "pitch", "yaw", "roll")
+# Storage type of replay trajectories built by data.player_data_split and to_town_layout.
+TRAJECTORY_DTYPE = np.float32
+
+
+class Trajectory():
+    """One actor's path as a (T, F) array with named column views."""
+
+    __slots__ = ("data", "fields")
+
+    def __init__(self, data, fields: Sequence[str] = HIGHWAY_FIELDS):
+        data = np.asarray(data)
+        if data.dtype.kind != "f":
+            data = data.astype(np.float64)
+        if data.ndim != 2 or data.shape[1] != len(fields):
+            raise ValueError(f"Expected shape (T, {len(fields)}) for fields {tuple(fields)}, got {data.shape}")
+        self.data = data
+        self.fields = tuple(fields)
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        return iter(self.data)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return Trajectory(self.data[idx], self.fields)
+        return self.data[idx]
+
+    def __getattr__(self, name: str) -> np.ndarray:
+        # Only reached when regular lookup fails, i.e. for field names.
+        if name in Trajectory.__slots__:
+            raise AttributeError(name)
+        return self.field(name)
+
+    def __repr__(self) -> str:
+        return f"Trajectory(len={len(self)}, fields={self.fields}, dtype={self.data.dtype})"
+
+    def field(self, name: str) -> np.ndarray:
+        try:
+            col = self.fields.index(name)
+        except ValueError:
+            raise AttributeError(f"Trajectory has no field {name!r} (fields: {self.fields})") from None
+        return self.data[:, col]
+
+    def pose(self, t: int) -> Tuple[float, ...]:
+        """Return every field except ``frame`` at tick ``t``, holding the last pose past the end.
+
+        For ``TOWN_FIELDS`` this is ``(x, y, z, pitch, yaw, roll)``. An empty
+        trajectory has no pose and raises ValueError.
+        """
+        if len(self) == 0:
+            raise ValueError("Empty trajectory has no pose")
+        row = self.data[min(t, len(self) - 1)]
+        return tuple(float(v) for v in row[1:])
+
+
+class TrajectorySet():
+    """Several trajectories packed into one contiguous array.
+
+    data: (sum of lengths, F) array; actor ``i`` owns rows
+    ``data[offsets[i]:offsets[i + 1]]``.
+    """
+
+    __slots__ = ("data", "offsets", "fields")
+
+    def __init__(self, data, offsets, fields: Sequence[str] = HIGHWAY_FIELDS):
+        data = np.asarray(data)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if data.ndim != 2 or data.shape[1] != len(fields):
+            raise ValueError(f"Expected shape (M, {len(fields)}) for fields {tuple(fields)}, got {data.shape}")
+        if offsets.ndim != 1 or len(offsets) == 0 or offsets[0] != 0 or offsets[-1] != len(data) or np.any(np.diff(offsets) < 0):
+            raise ValueError("offsets must be non-decreasing, start at 0 and end at len(data)")
+        self.data = data
+        self.offsets = offsets
+        self.fields = tuple(fields)
+
+    @classmethod
+    def from_paths(cls, paths: Iterable, fields: Sequence[str] = HIGHWAY_FIELDS, dtype=np.float64) -> "TrajectorySet":
+        """Pack a sequence of Trajectory objects or (T, F) array-likes."""
+        arrays = []
+        for p in paths:
+            a = p.data if isinstance(p, Trajectory) else np.asarray(p, dtype=dtype)
+            arrays.append(a.reshape(-1, len(fields)))
+        lengths = [len(a) for a in arrays]
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = np.concatenate(arrays).astype(dtype, copy=False) if arrays else np.empty((0, len(fields)), dtype=dtype)
+        return cls(data, offsets, fields)
+
+    @classmethod
+    def from_tensor(cls, tensor, fields: Sequence[str] = HIGHWAY_FIELDS) -> "TrajectorySet":
+        """Pack an (N, T, F) array of equal-length trajectories."""
+        tensor = np.ascontiguousarray(tensor)
+        n, t, f = tensor.shape
+        return cls(tensor.reshape(n * t, f), np.arange(n + 1, dtype=np.int64) * t, fields)
+
+    @classmethod
+    def coerce(cls, paths, fields: Sequence[str] = HIGHWAY_FIELDS) -> "TrajectorySet":
+        if isinstance(paths, TrajectorySet):
+            return paths
+        if isinstance(paths, Trajectory):
+            return cls.from_paths([paths], paths.fields)
+        return cls.from_paths(paths, fields)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __iter__(self) -> Iterator[Trajectory]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, idx: Union[int, slice]):
+        if isinstance(idx, slice):
+            start, stop, step = idx.indices(len(self))
+            if step != 1:
+                return TrajectorySet.from_paths([self[i] for i in range(start, stop, step)], self.fields, self.data.dtype)
+            stop = max(start, stop)
+            lo, hi = self.offsets[start], self.offsets[stop]
+            return TrajectorySet(self.data[lo:hi], self.offsets[start:stop + 1] - lo, self.fields)
+        n = len(self)
+        if idx < 0:
+            idx += n
+        if not 0 <= idx < n:
+            raise IndexError(f"actor index {idx} out of range for {n} trajectories")
+        return Trajectory(self.data[self.offsets[idx]:self.offsets[idx + 1]], self.fields)
+
+    def __repr__(self) -> str:
+        return f"TrajectorySet(actors={len(self)}, points={len(self.data)}, fields={self.fields}, dtype={self.data.dtype})"
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + self.offsets.nbytes
+
+    def field(self, name: str) -> np.ndarray:
+        """Column ``name`` for all actors, concatenated in actor order."""
+        try:
+            col = self.fields.index(name)
+        except ValueError:
+            raise AttributeError(f"TrajectorySet has no field {name!r} (fields: {self.fields})") from None
+        return self.data[:, col]
+
+    def rows_at(self, t) -> np.ndarray:
+        """Row indices into ``data`` for tick(s) ``t``, holding each actor's last pose.
+
+        ``t`` may be a scalar or an array of ticks; the result broadcasts to
+        (N,) or (N, len(t)). Empty trajectories map to -1.
+        """
+        lengths = self.lengths
+        t = np.asarray(t, dtype=np.int64)
+        last = (lengths - 1).reshape((-1,) + (1,) * t.ndim)
+        local = np.minimum(np.maximum(t, 0), last)
+        rows = self.offsets[:-1].reshape(last.shape) + local
+        return np.where(last >= 0, rows, -1)
+
+    def at(self, t: int) -> np.ndarray:
+        """Poses of every actor at tick ``t`` as an (N, F) array (NaN for empty trajectories)."""
+        rows = self.rows_at(t)
+        if len(self.data) == 0:
+            return np.full((len(self), len(self.fields)), np.nan)
+        out = self.data[np.maximum(rows, 0)].astype(np.float64)
+        out[rows < 0] = np.nan
+        return out
+
+
+def to_town_layout(paths, offset_xyz: Sequence[float], min_x: float = 0.0, yaw_offset_deg: float = 0.0,
+                   pitch_deg: float = 0.0, roll_deg: float = 0.0, dtype=TRAJECTORY_DTYPE) -> TrajectorySet:
+    """Convert dataset-space trajectories (``HIGHWAY_FIELDS``) to ``TOWN_FIELDS``.
+
+    offset_xyz: [x_offset, y_offset, z_height] of the dataset origin in the town.
+    The arithmetic runs in float64 and the result is stored as ``dtype``.
+    """
+    src = TrajectorySet.coerce(paths)
+    out = np.empty((len(src.data), len(TOWN_FIELDS)), dtype=dtype)
+    out[:, 0] = src.field("frame")
+    out[:, 1] = src.field("x").astype(np.float64) + (offset_xyz[0] - min_x)
+    out[:, 2] = src.field("y").astype(np.float64) + offset_xyz[1]
+    out[:, 3] = offset_xyz[2]
+    out[:, 4] = pitch_deg
+    out[:, 5] = src.field("yaw").astype(np.float64) * (180.0 / math.pi) + yaw_offset_deg
+    out[:, 6] = roll_deg
+    return TrajectorySet(out, src.offsets.copy(), TOWN_FIELDS)
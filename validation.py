@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""Vectorized kinematic validation of scenario tensors.
+
+Checks a whole (T, N, 4) ``[frame, x, y, yaw]`` array in one pass of NumPy
+before anything is rendered:
+
+- ``nan``:        non-finite values
+- ``teleport``:   speed between consecutive frames above ``max_speed``
+- ``accel``:      change of speed above ``max_accel``
+- ``yaw_rate``:   (wrapped) heading change above ``max_yaw_rate``
+- ``yaw_wrap``:   raw heading jumps of more than pi, which ``data.route_extend``
+                  interpolates the long way round
+- ``frame_gap``:  frame column not advancing by exactly one
+
+Each check yields, per car, the indices of the frames where it fails (the
+later frame of the offending pair).
+
+Examples:
+  python3 validation.py --scene Roundabout
+  python3 validation.py --scene ChangeLane --max-speed 40 --fail-fast
+"""
+
+import argparse
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import data
+
+CHECKS = ("nan", "teleport", "accel", "yaw_rate", "yaw_wrap", "frame_gap")
+
+DEFAULT_DT = data.FRAME_SECONDS
+
+
+class Limits():
+    """Physical limits used by :func:`validate` (SI units, radians)."""
+
+    def __init__(self, dt: float = DEFAULT_DT, max_speed: float = 60.0, max_accel: float = 15.0,
+                 max_yaw_rate: float = 3.0, check_frames: bool = True):
+        if dt <= 0:
+            raise ValueError(f"dt must be positive, got {dt}")
+        self.dt = float(dt)
+        self.max_speed = float(max_speed)
+        self.max_accel = float(max_accel)
+        self.max_yaw_rate = float(max_yaw_rate)
+        self.check_frames = bool(check_frames)
+
+
+class ValidationReport():
+    """Per-check, per-car frame indices of failures."""
+
+    def __init__(self, shape, issues: Dict[str, Dict[int, List[int]]]):
+        self.shape = tuple(shape)
+        self.issues = issues
+
+    @property
+    def ok(self) -> bool:
+        return not any(self.issues.values())
+
+    def cars(self) -> Dict[int, Dict[str, List[int]]]:
+        """Regroup as {car: {check: [frames]}} for cars with at least one issue."""
+        out: Dict[int, Dict[str, List[int]]] = {}
+        for check, per_car in self.issues.items():
+            for car, frames in per_car.items():
+                out.setdefault(car, {})[check] = frames
+        return dict(sorted(out.items()))
+
+    def to_dict(self) -> Dict:
+        return {
+            "shape": list(self.shape),
+            "ok": self.ok,
+            "cars": {str(car): checks for car, checks in self.cars().items()},
+        }
+
+    def summary(self, max_frames: int = 5) -> str:
+        T, N = self.shape[:2]
+        if self.ok:
+            return f"OK: {T} frames x {N} cars"
+        lines = [f"FAILED: {T} frames x {N} cars"]
+        for car, checks in self.cars().items():
+            parts = []
+            for check in CHECKS:
+                frames = checks.get(check)
+                if frames:
+                    shown = ", ".join(str(f) for f in frames[:max_frames])
+                    more = f", ... (+{len(frames) - max_frames})" if len(frames) > max_frames else ""
+                    parts.append(f"{check}@[{shown}{more}]")
+            lines.append(f"  car {car}: " + " ".join(parts))
+        return "\n".join(lines)
+
+
+class ValidationError(ValueError):
+    def __init__(self, report: ValidationReport):
+        super().__init__(report.summary())
+        self.report = report
+
+
+def _per_car(mask: np.ndarray, frame_offset: int = 0) -> Dict[int, List[int]]:
+    """(T', N) boolean mask -> {car: [frame indices]} for cars with any True."""
+    frames, cars = np.nonzero(mask)
+    out: Dict[int, List[int]] = {}
+    for car in np.unique(cars):
+        out[int(car)] = (frames[cars == car] + frame_offset).tolist()
+    return out
+
+
+def wrap_angle(a):
+    """Wrap radians to [-pi, pi)."""
+    return (a + np.pi) % (2 * np.pi) - np.pi
+
+
+def validate(arr, limits: Optional[Limits] = None, fail_fast: bool = False) -> ValidationReport:
+    """Validate a (T, N, 4) scenario tensor.
+
+    With ``fail_fast`` a :class:`ValidationError` is raised as soon as one
+    check fails, skipping the remaining checks. Otherwise the full report is
+    returned and the caller decides.
+    """
+    limits = limits or Limits()
+    arr = np.asarray(arr, dtype=np.float64)
+    if arr.ndim != 3 or arr.shape[-1] != 4:
+        raise ValueError(f"Expected (T, N, 4) data, got shape {arr.shape}")
+
+    issues: Dict[str, Dict[int, List[int]]] = {}
+
+    def record(check, mask, frame_offset=0):
+        issues[check] = _per_car(mask, frame_offset)
+        if fail_fast and issues[check]:
+            raise ValidationError(ValidationReport(arr.shape, issues))
+
+    record("nan", ~np.isfinite(arr).all(axis=-1))
+
+    dt = limits.dt
+    with np.errstate(invalid="ignore"):
+        step = np.hypot(np.diff(arr[..., 1], axis=0), np.diff(arr[..., 2], axis=0))  # (T-1, N)
+        speed = step / dt
+        record("teleport", speed > limits.max_speed, 1)
+
+        accel = np.abs(np.diff(speed, axis=0)) / dt  # (T-2, N)
+        record("accel", accel > limits.max_accel, 2)
+
+        dyaw = np.diff(arr[..., 3], axis=0)
+        record("yaw_rate", np.abs(wrap_angle(dyaw)) / dt > limits.max_yaw_rate, 1)
+        record("yaw_wrap", np.abs(dyaw) > np.pi, 1)
+
+        if limits.check_frames:
+            record("frame_gap", np.diff(arr[..., 0], axis=0) != 1, 1)
+
+    return ValidationReport(arr.shape, issues)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    defaults = Limits()
+    p = argparse.ArgumentParser(description="Validate scenario kinematics before rendering")
+    p.add_argument("--scene", default="ChangeLane")
+    p.add_argument("--data-root", default="data")
+    p.add_argument("--dt", type=float, default=defaults.dt, help="Seconds between dataset frames")
+    p.add_argument("--max-speed", type=float, default=defaults.max_speed, help="m/s")
+    p.add_argument("--max-accel", type=float, default=defaults.max_accel, help="m/s^2")
+    p.add_argument("--max-yaw-rate", type=float, default=defaults.max_yaw_rate, help="rad/s")
+    p.add_argument("--no-frame-check", dest="check_frames", action="store_false",
+                   help="Skip the frame_gap check (for datasets whose first column is not a frame index)")
+    p.add_argument("--fail-fast", action="store_true")
+    return p
+
+
+def limits_from_args(args) -> Limits:
+    return Limits(dt=args.dt, max_speed=args.max_speed, max_accel=args.max_accel,
+                  max_yaw_rate=args.max_yaw_rate, check_frames=args.check_frames)
+
+
+def main() -> int:
+    args = build_parser().parse_args()
+    arr = data.data_mix(scene=args.scene, data_root=args.data_root)
+    try:
+        report = validate(arr, limits_from_args(args), fail_fast=args.fail_fast)
+    except ValidationError as e:
+        print(e)
+        return 1
+    print(report.summary())
+    return 0 if report.ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,54 +1,146 @@
 import numpy as np
 import matplotlib.pyplot as plt
+import hashlib
+import json
 import os
+import sys
 from pathlib import Path
 import imageio
 
+# The scene catalog lives at the repository root, one level up.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import catalog
+
+# Everything that affects how a frame looks. Changing any value re-renders
+# all frames; bump RENDER_VERSION when the drawing code itself changes.
+RENDER_VERSION = 1
+RENDER_SETTINGS = {
+    'figsize': (12, 10),
+    'dpi': 100,
+    'padding_x': 0.1,
+    'padding_y': 2,
+    'npc_color': 'blue',
+    'main_color': 'red',
+}
+MANIFEST_NAME = 'manifest.json'
+
 def load_data(scene='IntersectionMerge', data_root='../data'):
     """Load the driving scene data."""
     data_path = os.path.join(data_root, scene, 'data.npy')
     data = np.load(data_path, allow_pickle=False)
     return data
 
-def visualize_frames(data, output_dir='frames'):
+def catalog_bounds(scene='IntersectionMerge', data_root='../data'):
+    """
+    xy bounds of data_root/scene/data.npy from the existing scene catalog.
+
+    The catalog is only read, never refreshed or written. Returns None (so
+    visualize_frames computes the bounds from the data) when there is no
+    entry, it describes another file, or the file changed since it was indexed.
+    """
+    entry = catalog.load_catalog(data_root, refresh=False).get(scene)
+    if entry is None or entry['file'] != os.path.join(entry['scene'], 'data.npy'):
+        return None
+    try:
+        st = os.stat(os.path.join(data_root, entry['file']))
+    except OSError:
+        return None
+    if (st.st_size, st.st_mtime_ns) != (entry['size'], entry['mtime_ns']):
+        return None
+    return entry['bounds']
+
+def _load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+def _save_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def frame_hash(frame_data, num_frames, limits, settings):
+    """Content hash of everything that determines one rendered frame."""
+    h = hashlib.sha1()
+    h.update(np.ascontiguousarray(frame_data, dtype=np.float64).tobytes())
+    h.update(json.dumps([RENDER_VERSION, num_frames, limits, settings], sort_keys=True).encode())
+    return h.hexdigest()
+
+def visualize_frames(data, output_dir='frames', settings=None, force=False, bounds=None):
     """
     Create visualization plots for each frame.
+
+    Frames whose content hash (data slice, axis limits, render settings) matches
+    the manifest in output_dir and whose image still exists are not re-rendered.
     
     Args:
         data: numpy array of shape (T, N, 4) where each entry is [frame, x, y, yaw]
         output_dir: directory to save frame images
+        settings: render settings, defaults to RENDER_SETTINGS
+        force: re-render every frame
+        bounds: {'x': [min, max], 'y': [min, max]} of the data (e.g. from the
+            scene catalog); computed from data when not given
+
+    Returns:
+        number of frames rendered
     """
     os.makedirs(output_dir, exist_ok=True)
+    settings = dict(RENDER_SETTINGS if settings is None else settings)
     
     num_frames, num_cars, _ = data.shape
     
     # Determine axis limits from all data
-    all_x = data[:, :, 1].flatten()  # x coordinates
-    all_y = data[:, :, 2].flatten()  # y coordinates
-    
-    x_min, x_max = all_x.min(), all_x.max()
-    y_min, y_max = all_y.min(), all_y.max()
+    if bounds is None:
+        all_x = data[:, :, 1].flatten()  # x coordinates
+        all_y = data[:, :, 2].flatten()  # y coordinates
+        
+        x_min, x_max = all_x.min(), all_x.max()
+        y_min, y_max = all_y.min(), all_y.max()
+    else:
+        (x_min, x_max), (y_min, y_max) = bounds['x'], bounds['y']
     
     # Add some padding
     x_range = x_max - x_min
     y_range = y_max - y_min
-    padding_x = x_range * 0.1
+    padding_x = x_range * settings['padding_x']
     # Increase Y-axis padding significantly to provide a larger viewing window
-    padding_y = y_range * 2 # significantly increased from 0.1 to 0.5 for better viewing
-    
-    print(f"Creating {num_frames} frame visualizations...")
-    
+    padding_y = y_range * settings['padding_y'] # significantly increased from 0.1 to 0.5 for better viewing
+    limits = [float(x_min - padding_x), float(x_max + padding_x), float(y_min - padding_y), float(y_max + padding_y)]
+
+    old_manifest = {} if force else _load_manifest(output_dir).get('frames', {})
+    manifest = {}
+    stale = []
     for frame_idx in range(num_frames):
+        name = f'frame_{frame_idx:04d}.png'
+        manifest[name] = frame_hash(data[frame_idx], num_frames, limits, settings)
+        if old_manifest.get(name) != manifest[name] or not os.path.exists(os.path.join(output_dir, name)):
+            stale.append(frame_idx)
+
+    # Frames left over from a longer previous input, whether or not a manifest listed them
+    for name in os.listdir(output_dir):
+        if name.startswith('frame_') and name.endswith('.png') and name not in manifest:
+            os.remove(os.path.join(output_dir, name))
+
+    print(f"Creating {len(stale)}/{num_frames} frame visualizations ({num_frames - len(stale)} up to date)...")
+    
+    for count, frame_idx in enumerate(stale):
         frame_data = data[frame_idx]  # Shape: (N, 4)
         
-        fig, ax = plt.subplots(figsize=(12, 10))
+        fig, ax = plt.subplots(figsize=settings['figsize'])
         
         # Plot NPC cars (indices 1 onwards)
         npc_x = frame_data[1:, 1]  # x coordinates
         npc_y = frame_data[1:, 2]  # y coordinates
         npc_yaw = frame_data[1:, 3]  # yaw angles
         
-        ax.scatter(npc_x, npc_y, c='blue', s=100, alpha=0.7, 
+        ax.scatter(npc_x, npc_y, c=settings['npc_color'], s=100, alpha=0.7, 
                   marker='o', edgecolors='darkblue', linewidths=1.5,
                   label='NPC Cars')
         
@@ -57,7 +149,7 @@ def visualize_frames(data, output_dir='frames'):
         main_y = frame_data[0, 2]
         main_yaw = frame_data[0, 3]
         
-        ax.scatter(main_x, main_y, c='red', s=200, alpha=0.9,
+        ax.scatter(main_x, main_y, c=settings['main_color'], s=200, alpha=0.9,
                   marker='*', edgecolors='darkred', linewidths=2,
                   label='Main Car', zorder=5)
         
@@ -71,8 +163,8 @@ def visualize_frames(data, output_dir='frames'):
                 linewidth=2, zorder=6)
         
         # Set axis limits
-        ax.set_xlim(x_min - padding_x, x_max + padding_x)
-        ax.set_ylim(y_min - padding_y, y_max + padding_y)
+        ax.set_xlim(limits[0], limits[1])
+        ax.set_ylim(limits[2], limits[3])
         ax.invert_yaxis()  # Reverse the Y-axis
         
         # Labels and title
@@ -86,30 +178,49 @@ def visualize_frames(data, output_dir='frames'):
         # Save frame
         frame_path = os.path.join(output_dir, f'frame_{frame_idx:04d}.png')
         plt.tight_layout()
-        plt.savefig(frame_path, dpi=100, bbox_inches='tight')
+        plt.savefig(frame_path, dpi=settings['dpi'], bbox_inches='tight')
         plt.close()
         
-        if (frame_idx + 1) % 20 == 0:
-            print(f"  Processed {frame_idx + 1}/{num_frames} frames...")
-    
+        if (count + 1) % 20 == 0:
+            print(f"  Processed {count + 1}/{len(stale)} frames...")
+
+    _save_manifest(output_dir, {'frames': manifest, 'gif': _load_manifest(output_dir).get('gif')})
     print(f"All frames saved to {output_dir}/")
+    return len(stale)
 
-def create_gif(frame_dir='frames', output_gif='intersection_merge.gif', fps=10):
+def create_gif(frame_dir='frames', output_gif='intersection_merge.gif', fps=10, force=False):
     """
     Create a GIF from frame images.
+
+    The GIF is skipped when it exists and neither the frame manifest nor fps
+    changed since it was written.
     
     Args:
         frame_dir: directory containing frame images
         output_gif: output GIF filename
         fps: frames per second for the GIF
+        force: rebuild even if up to date
     """
-    print(f"Creating GIF from frames in {frame_dir}...")
-    
-    # Get all frame files sorted
-    frame_files = sorted([f for f in os.listdir(frame_dir) if f.startswith('frame_') and f.endswith('.png')])
+    # Frames listed in the manifest written by visualize_frames, else every frame file
+    manifest = _load_manifest(frame_dir)
+    frames = manifest.get('frames')
+    if frames:
+        frame_files = sorted(frames)
+    else:
+        frame_files = sorted([f for f in os.listdir(frame_dir) if f.startswith('frame_') and f.endswith('.png')])
     
     if not frame_files:
         raise ValueError(f"No frame images found in {frame_dir}")
+
+    gif_key = None
+    if frames and all(os.path.exists(os.path.join(frame_dir, f)) for f in frame_files):
+        h = hashlib.sha1(json.dumps([frames, fps, os.path.abspath(output_gif)], sort_keys=True).encode())
+        gif_key = h.hexdigest()
+        if not force and manifest.get('gif') == gif_key and os.path.exists(output_gif):
+            print(f"GIF {output_gif} is up to date")
+            return
+
+    print(f"Creating GIF from frames in {frame_dir}...")
     
     # Read all images
     images = []
@@ -121,6 +232,9 @@ def create_gif(frame_dir='frames', output_gif='intersection_merge.gif', fps=10):
     duration_ms = 1000 / fps
     gif_path = output_gif
     imageio.mimsave(gif_path, images, duration=duration_ms, loop=0)
+    if gif_key is not None:
+        manifest['gif'] = gif_key
+        _save_manifest(frame_dir, manifest)
     print(f"GIF saved to {gif_path}")
 
 if __name__ == '__main__':
@@ -131,7 +245,7 @@ if __name__ == '__main__':
     
     # Create visualizations
     frame_dir = 'frames'
-    visualize_frames(data, output_dir=frame_dir)
+    visualize_frames(data, output_dir=frame_dir, bounds=catalog_bounds(scene='IntersectionMerge'))
     
     # Create GIF
     gif_name = 'intersection_merge_visualization.gif'